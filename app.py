@@ -4,21 +4,8 @@ from dotenv import load_dotenv
 from datetime import datetime, date, timedelta
 import json
 
-# Imports pour le calendrier
-from streamlit_calendar import calendar
-
-# Imports de tes modules
-from scrap_edt import get_edt_semaine
-from schedule_functions import (
-    load_schedule_data, 
-    get_courses_by_date_range, 
-    get_courses_by_subject, 
-    get_free_time_slots, 
-    get_next_course,
-    TOOLS,
-    AVAILABLE_FUNCTIONS
-)
-from openai import OpenAI
+# streamlit_calendar, openai, scrap_edt et schedule_functions sont importés là où ils
+# servent : le premier affichage de la page n'attend pas leur chargement.
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -33,11 +20,22 @@ def check_api_key():
     return api_key
 
 def ensure_schedule_data(user_id):
-    """S'assure que les données d'emploi du temps sont disponibles avec meilleur feedback"""
-    json_dir = "json_schedules"
-    json_file = os.path.join(json_dir, f"{user_id}_edt.json")
+    """
+    S'assure que les données d'emploi du temps sont disponibles avec meilleur feedback.
+    La validation passe par le cache de schedule_store : le fichier n'est relu et
+    parsé que s'il a changé depuis le dernier rerun.
+    """
+    from schedule_store import get_schedule
+
+    try:
+        data = get_schedule(user_id)
+    except Exception as e:
+        st.error(f"❌ Fichier emploi du temps corrompu : {e}")
+        return False
     
-    if not os.path.exists(json_file):
+    if data is None:
+        from scrap_edt import get_edt_semaine
+
         st.info(f"📥 Première connexion pour {user_id}. Récupération de l'emploi du temps...")
         try:
             with st.spinner("🔄 Téléchargement en cours..."):
@@ -52,20 +50,16 @@ def ensure_schedule_data(user_id):
             return False
     
     # Vérifier que le fichier contient des données valides
-    try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        if not data or (isinstance(data, dict) and not data.get("emploi_du_temps")):
-            st.warning("⚠️ Fichier emploi du temps vide, nouvelle récupération...")
-            result = get_edt_semaine(user_id)
-            return True
-            
-        return True
-        
-    except Exception as e:
-        st.error(f"❌ Fichier emploi du temps corrompu : {e}")
-        return False
+    if not data or (isinstance(data, dict) and not data.get("emploi_du_temps")):
+        st.warning("⚠️ Fichier emploi du temps vide, nouvelle récupération...")
+        from scrap_edt import get_edt_semaine
+        try:
+            get_edt_semaine(user_id)
+        except Exception as e:
+            st.error(f"❌ Erreur lors de la récupération : {e}")
+            return False
+    
+    return True
 
 
 
@@ -75,86 +69,193 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def generate_response(prompt: str, user_id: str) -> str:
-    """Génère une réponse en utilisant les function calling d'OpenAI"""
+# Nombre maximal de tours d'appels d'outils par message avant une réponse forcée sans outils
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "3"))
+
+# Connexions HTTP gardées ouvertes vers l'API OpenAI (partagées par toutes les sessions)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+
+# Vues du calendrier proposées, et marge d'événements envoyés de part et d'autre de la période affichée
+CALENDAR_VIEWS = {"Semaine": "timeGridWeek", "Mois": "dayGridMonth", "Jour": "timeGridDay"}
+CALENDAR_PREFETCH_DAYS = int(os.getenv("CALENDAR_PREFETCH_DAYS", "7"))
+
+# Partie fixe du prompt système : identique pour tous les messages et tous les utilisateurs
+SYSTEM_PROMPT_RULES = """Tu es un assistant de planification d'études expert.
+
+⚠️ RÈGLE ABSOLUE : Tu DOIS TOUJOURS appeler les fonctions disponibles pour récupérer les vraies données avant de répondre. 
+Ne réponds JAMAIS sans avoir vérifié les données !
+
+🔧 FONCTIONS OBLIGATOIRES :
+- Pour "mes cours demain/aujourd'hui/cette semaine" → UTILISE get_courses_by_date_range()
+- Pour "mes cours de maths/français" → UTILISE get_courses_by_subject()  
+- Pour "suis-je libre" → UTILISE get_free_time_slots()
+- Pour "mon prochain cours" → UTILISE get_next_course()
+
+RÈGLES IMPORTANTES:
+1. ⚠️ APPELLE TOUJOURS les fonctions avant de répondre. Ne fais JAMAIS d'hypothèses sur les données !
+2. Quand tu proposes des sessions de révision ET que l'utilisateur accepte (dit "oui", "d'accord", "merci", "ajoute-les"), 
+   tu DOIS utiliser add_event_to_calendar pour CHAQUE session.
+3. Format des dates pour les fonctions: "YYYY-MM-DDTHH:MM:SS" (ex: "2025-01-15T08:00:00")
+4. Détecte les confirmations: "oui", "merci", "d'accord", "parfait", "génial" = AJOUT AUTOMATIQUE
+5. IMPORTANT: Ne passe PAS le paramètre user_id dans tes function calls - il est automatiquement fourni.
+6. Les listes de cours sont des tables compactes : "jours" donne pour chaque date des lignes suivant "colonnes",
+   où cours/prof/salle sont des indices dans les listes "cours", "profs" et "salles"."""
+
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client():
+    """
+    Client OpenAI du processus : son pool de connexions keep-alive est réutilisé
+    d'un message à l'autre (pas de nouvelle poignée de main TLS par prompt).
+    """
+    import httpx
+    from openai import DefaultHttpxClient, OpenAI
+
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=DefaultHttpxClient(limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+        ))
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def setup_french_locale():
+    """Locale française pour les noms de jours et de mois (réglée une seule fois par processus)."""
+    import locale
+
+    for name in ('fr_FR.UTF-8', 'French'):
+        try:
+            return locale.setlocale(locale.LC_TIME, name)
+        except locale.Error:
+            continue
+    return None
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def date_context(day: date) -> str:
+    """Repères temporels du prompt : ne changent qu'avec le jour."""
+    setup_french_locale()
+    demain = day + timedelta(days=1)
+
+    debut_semaine = day - timedelta(days=day.weekday())
+    fin_semaine = debut_semaine + timedelta(days=6)
+
+    debut_semaine_prochaine = debut_semaine + timedelta(days=7)
+    fin_semaine_prochaine = debut_semaine_prochaine + timedelta(days=6)
+
+    return f"""🗓️ CONTEXTE TEMPOREL ACTUEL:
+- Nous sommes le : {day.strftime('%A %d %B %Y')} ({day.isoformat()})
+- Demain sera : {demain.strftime('%A %d %B %Y')} ({demain.isoformat()})
+- Cette semaine : du {debut_semaine.strftime('%A %d %B')} au {fin_semaine.strftime('%A %d %B %Y')}
+- Semaine prochaine : du {debut_semaine_prochaine.strftime('%A %d %B')} au {fin_semaine_prochaine.strftime('%A %d %B %Y')}
+
+📅 RÉFÉRENCES TEMPORELLES:
+- "aujourd'hui" = {day.isoformat()}
+- "demain" = {demain.isoformat()}
+- "cette semaine" = {debut_semaine.isoformat()} à {fin_semaine.isoformat()}
+- "la semaine prochaine" = {debut_semaine_prochaine.isoformat()} à {fin_semaine_prochaine.isoformat()}
+- "lundi prochain" = {(debut_semaine_prochaine).isoformat()}
+- "ce weekend" = {(fin_semaine - timedelta(days=1)).isoformat()} à {fin_semaine.isoformat()}"""
+
+
+def visible_range(view: str, day: date):
+    """Première et dernière date (exclue) affichées par FullCalendar pour `view` autour de `day`."""
+    if view == "timeGridDay":
+        return day, day + timedelta(days=1)
+    if view == "dayGridMonth":
+        # Grille de 6 semaines commençant le lundi de la semaine du 1er du mois
+        first = day.replace(day=1)
+        start = first - timedelta(days=first.weekday())
+        return start, start + timedelta(days=42)
+    start = day - timedelta(days=day.weekday())
+    return start, start + timedelta(days=7)
+
+
+def shift_calendar_date(view: str, day: date, step: int) -> date:
+    """Date affichée après un clic sur précédent (-1) ou suivant (+1)."""
+    if view == "timeGridDay":
+        return day + timedelta(days=step)
+    if view == "dayGridMonth":
+        month = day.year * 12 + day.month - 1 + step
+        return date(month // 12, month % 12 + 1, 1)
+    return day + timedelta(days=7 * step)
+
+
+def build_context_message(user_id: str, maintenant: datetime) -> str:
+    """
+    Partie variable du prompt système (utilisateur, contexte du jour mis en cache, heure
+    courante), envoyée après l'historique : SYSTEM_PROMPT_RULES reste un préfixe fixe.
+    """
+    return (
+        f"👤 Utilisateur : {user_id}\n\n"
+        f"{date_context(maintenant.date())}\n"
+        f"- Il est actuellement : {maintenant.strftime('%H:%M')}"
+    )
+
+
+def _collect_tool_calls(tool_calls: dict, deltas) -> None:
+    """Recompose les tool calls à partir des fragments reçus en streaming (indexés par position)."""
+    for delta in deltas or []:
+        call = tool_calls.setdefault(delta.index, {"id": None, "name": "", "arguments": ""})
+        if delta.id:
+            call["id"] = delta.id
+        if delta.function:
+            call["name"] += delta.function.name or ""
+            call["arguments"] += delta.function.arguments or ""
+
+
+def stream_response(prompt: str, user_id: str):
+    """
+    Génère une réponse en utilisant les function calling d'OpenAI, en streaming :
+    les morceaux de texte sont produits dès leur arrivée, pour la réponse directe
+    comme pour la réponse finale après appel des outils.
+
+    Jusqu'à MAX_TOOL_ROUNDS tours d'outils sont possibles ; les lectures déjà faites
+    dans la session (même outil, mêmes arguments, même version du fichier) ne sont
+    pas ré-exécutées. Les questions simples et sans ambiguïté ("mes cours demain",
+    "mon prochain cours") sont traitées localement par intent_router, sans appel au modèle.
+    """
     try:
-        from schedule_functions import AVAILABLE_FUNCTIONS, TOOLS
+        from context_builder import ConversationMemory, build_messages, count_message_tokens, dedupe_tool_content
+        from intent_router import answer as answer_locally
+        from response_cache import get_response_cache
+        from schedule_functions import MUTATING_FUNCTIONS, TOOLS, execute_tool_calls
+        from tool_results import compact_tool_result
         
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Intention claire : réponse directe à partir des outils, sans le modèle
+        local_answer = answer_locally(user_id, prompt)
+        if local_answer:
+            yield local_answer
+            return
+        
+        # Question fréquente déjà traitée sur la même version de l'emploi du temps
+        response_cache = get_response_cache()
+        cached = response_cache.lookup(user_id, prompt)
+        if cached:
+            yield cached
+            return
+        
+        client = get_openai_client()
         model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
         
         logger.info(f"🚀 Génération de réponse pour: {prompt}")
         logger.info(f"👤 User ID: {user_id}")
         logger.info(f"🔧 Nombre d'outils disponibles: {len(TOOLS)}")
         
-        # Contexte temporel
-        from datetime import datetime, timedelta
-        import locale
-        
-        try:
-            locale.setlocale(locale.LC_TIME, 'fr_FR.UTF-8')
-        except:
-            try:
-                locale.setlocale(locale.LC_TIME, 'French')
-            except:
-                pass
-        
-        maintenant = datetime.now()
-        aujourd_hui = maintenant.date()
-        demain = aujourd_hui + timedelta(days=1)
-        
-        jours_depuis_lundi = aujourd_hui.weekday()
-        debut_semaine = aujourd_hui - timedelta(days=jours_depuis_lundi)
-        fin_semaine = debut_semaine + timedelta(days=6)
-        
-        debut_semaine_prochaine = debut_semaine + timedelta(days=7)
-        fin_semaine_prochaine = debut_semaine_prochaine + timedelta(days=6)
-        
-        system_message = f"""
-        Tu es un assistant de planification d'études expert pour {user_id}.
-
-        ⚠️ RÈGLE ABSOLUE : Tu DOIS TOUJOURS appeler les fonctions disponibles pour récupérer les vraies données avant de répondre. 
-        Ne réponds JAMAIS sans avoir vérifié les données !
-
-        🗓️ CONTEXTE TEMPOREL ACTUEL:
-        - Nous sommes le : {aujourd_hui.strftime('%A %d %B %Y')} ({aujourd_hui.isoformat()})
-        - Il est actuellement : {maintenant.strftime('%H:%M')}
-        - Demain sera : {demain.strftime('%A %d %B %Y')} ({demain.isoformat()})
-        - Cette semaine : du {debut_semaine.strftime('%A %d %B')} au {fin_semaine.strftime('%A %d %B %Y')}
-        - Semaine prochaine : du {debut_semaine_prochaine.strftime('%A %d %B')} au {fin_semaine_prochaine.strftime('%A %d %B %Y')}
-
-        📅 RÉFÉRENCES TEMPORELLES:
-        - "aujourd'hui" = {aujourd_hui.isoformat()}
-        - "demain" = {demain.isoformat()}
-        - "cette semaine" = {debut_semaine.isoformat()} à {fin_semaine.isoformat()}
-        - "la semaine prochaine" = {debut_semaine_prochaine.isoformat()} à {fin_semaine_prochaine.isoformat()}
-        - "lundi prochain" = {(debut_semaine_prochaine).isoformat()}
-        - "ce weekend" = {(fin_semaine - timedelta(days=1)).isoformat()} à {fin_semaine.isoformat()}
-
-        🔧 FONCTIONS OBLIGATOIRES :
-        - Pour "mes cours demain/aujourd'hui/cette semaine" → UTILISE get_courses_by_date_range()
-        - Pour "mes cours de maths/français" → UTILISE get_courses_by_subject()  
-        - Pour "suis-je libre" → UTILISE get_free_time_slots()
-        - Pour "mon prochain cours" → UTILISE get_next_course()
-
-        RÈGLES IMPORTANTES:
-        1. ⚠️ APPELLE TOUJOURS les fonctions avant de répondre. Ne fais JAMAIS d'hypothèses sur les données !
-        2. Quand tu proposes des sessions de révision ET que l'utilisateur accepte (dit "oui", "d'accord", "merci", "ajoute-les"), 
-           tu DOIS utiliser add_event_to_calendar pour CHAQUE session.
-        3. Format des dates pour les fonctions: "YYYY-MM-DDTHH:MM:SS" (ex: "2025-01-15T08:00:00")
-        4. Détecte les confirmations: "oui", "merci", "d'accord", "parfait", "génial" = AJOUT AUTOMATIQUE
-        5. IMPORTANT: Ne passe PAS le paramètre user_id dans tes function calls - il est automatiquement fourni.
-        """
-        
-        messages = [{"role": "system", "content": system_message}]
-        
-        # Ajouter l'historique des messages
-        if "messages" in st.session_state and len(st.session_state.messages) > 0:
-            recent_messages = st.session_state.messages[-4:]
-            for msg in recent_messages:
-                messages.append({"role": msg["role"], "content": msg["content"]})
-        
-        messages.append({"role": "user", "content": prompt})
+        # Règles fixes, résumé des anciens échanges, derniers échanges sous budget de tokens,
+        # puis contexte du jour et question
+        memory = st.session_state.setdefault("conversation_memory", ConversationMemory())
+        messages = build_messages(
+            SYSTEM_PROMPT_RULES,
+            build_context_message(user_id, datetime.now()),
+            st.session_state.get("messages", []),
+            prompt,
+            memory
+        )
         
         logger.info(f"📨 Messages envoyés à OpenAI: {len(messages)}")
         logger.info(f"🔧 Outils envoyés: {[tool['function']['name'] for tool in TOOLS]}")
@@ -169,29 +270,67 @@ def generate_response(prompt: str, user_id: str) -> str:
                 force_tool = {"type": "function", "function": {"name": "get_courses_by_subject"}}
                 logger.info("🎯 Forçage d'appel de fonction: get_courses_by_subject")
         
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools=TOOLS,
-            tool_choice=force_tool if force_tool else "auto",
-            temperature=0.7,
-            max_tokens=2000
-        )
-        
-        message = response.choices[0].message
-        logger.info(f"🤖 Réponse OpenAI reçue")
-        logger.info(f"📝 Contenu: {message.content if message.content else 'Aucun contenu'}")
-        logger.info(f"🔧 Tool calls: {len(message.tool_calls) if message.tool_calls else 0}")
+        # Résultats d'outils déjà calculés dans cette session (invalidés par la version du fichier)
+        tool_memo = st.session_state.setdefault("tool_memo", {})
+        used_tools = set()
         
-        # Vérifier si l'IA veut utiliser des outils
-        if hasattr(message, 'tool_calls') and message.tool_calls:
-            logger.info(f"🔧 L'IA veut utiliser {len(message.tool_calls)} outil(s)")
+        # Boucle bornée : le modèle peut enchaîner plusieurs tours d'outils, et répond
+        # directement (sans appel supplémentaire) dès qu'il n'en a plus besoin
+        for round_index in range(MAX_TOOL_ROUNDS + 1):
+            last_round = round_index == MAX_TOOL_ROUNDS
+            request = {"model": model, "messages": messages, "temperature": 0.7, "max_tokens": 2000, "stream": True}
+            if not last_round:
+                request["tools"] = TOOLS
+                request["tool_choice"] = force_tool if (force_tool and round_index == 0) else "auto"
+            else:
+                logger.info("🔄 Génération de la réponse finale (nombre maximal de tours d'outils atteint)...")
+            logger.info(f"🧮 Tokens d'entrée estimés (tour {round_index + 1}): {count_message_tokens(messages)}")
+            stream = client.chat.completions.create(**request)
+            
+            content_parts = []
+            tool_calls = {}
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    yield delta.content
+                _collect_tool_calls(tool_calls, delta.tool_calls)
+            content = "".join(content_parts)
+            logger.info(f"🤖 Réponse OpenAI reçue (tour {round_index + 1})")
+            logger.info(f"📝 Contenu: {content if content else 'Aucun contenu'}")
+            logger.info(f"🔧 Tool calls: {len(tool_calls)}")
+            
+            # Plus d'outil demandé : la réponse affichée est la réponse finale
+            if not tool_calls:
+                if round_index == 0:
+                    logger.warning("⚠️ L'IA n'a fait aucun appel de fonction !")
+                    logger.warning(f"📝 Réponse directe: {content}")
+                else:
+                    logger.info(f"✅ Réponse finale générée: {content[:100]}...")
+                    # Seules les réponses fondées sur des lectures de l'emploi du temps sont réutilisables
+                    if not used_tools & MUTATING_FUNCTIONS:
+                        response_cache.store(user_id, prompt, content)
+                return
             
-            messages.append(message)
+            logger.info(f"🔧 L'IA veut utiliser {len(tool_calls)} outil(s)")
             
-            for tool_call in message.tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
+            tool_calls = [tool_calls[index] for index in sorted(tool_calls)]
+            messages.append({
+                "role": "assistant",
+                "content": content or None,
+                "tool_calls": [
+                    {"id": call["id"], "type": "function",
+                     "function": {"name": call["name"], "arguments": call["arguments"]}}
+                    for call in tool_calls
+                ]
+            })
+            
+            calls = []
+            for tool_call in tool_calls:
+                function_name = tool_call["name"]
+                function_args = json.loads(tool_call["arguments"] or "{}")
                 
                 logger.info(f"📞 Appel fonction: {function_name}")
                 logger.info(f"📝 Arguments bruts: {function_args}")
@@ -202,53 +341,32 @@ def generate_response(prompt: str, user_id: str) -> str:
                     logger.info(f"🔧 user_id supprimé des arguments")
                 
                 logger.info(f"📝 Arguments finaux: {function_args}")
-                
-                if function_name in AVAILABLE_FUNCTIONS:
-                    try:
-                        # user_id est passé explicitement comme premier paramètre
-                        function_result = AVAILABLE_FUNCTIONS[function_name](user_id, **function_args)
-                        
-                        logger.info(f"✅ Résultat fonction: {function_result}")
-                        
-                        messages.append({
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",  
-                            "name": function_name,
-                            "content": json.dumps(function_result, ensure_ascii=False)
-                        })
-                    except Exception as func_error:
-                        logger.error(f"❌ Erreur lors de l'appel de {function_name}: {func_error}")
-                        messages.append({
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",  
-                            "name": function_name,
-                            "content": json.dumps({"error": str(func_error)}, ensure_ascii=False)
-                        })
-                else:
-                    logger.error(f"❌ Fonction inconnue: {function_name}")
+                calls.append((function_name, function_args))
+                used_tools.add(function_name)
             
-            logger.info("🔄 Génération de la réponse finale...")
-            final_response = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            final_content = final_response.choices[0].message.content
-            logger.info(f"✅ Réponse finale générée: {final_content[:100]}...")
-            return final_content
-        else:
-            logger.warning("⚠️ L'IA n'a fait aucun appel de fonction !")
-            logger.warning(f"📝 Réponse directe: {message.content}")
+            # Lectures en parallèle (ou depuis le mémo), modifications regroupées en une seule écriture
+            function_results = execute_tool_calls(user_id, calls, memo=tool_memo)
             
-        return message.content
+            for tool_call, function_result in zip(tool_calls, function_results):
+                logger.info(f"✅ Résultat {tool_call['name']}: {function_result}")
+                # Chaque tool call attend une réponse (y compris en cas d'erreur)
+                messages.append({
+                    "tool_call_id": tool_call["id"],
+                    "role": "tool",  
+                    "name": tool_call["name"],
+                    "content": dedupe_tool_content(messages, compact_tool_result(tool_call["name"], function_result))
+                })
         
     except Exception as e:
         logger.error(f"❌ Erreur génération réponse: {e}")
         import traceback
         logger.error(f"📍 Traceback: {traceback.format_exc()}")
-        return f"❌ Désolé, une erreur est survenue: {str(e)}"
+        yield f"❌ Désolé, une erreur est survenue: {str(e)}"
+
+
+def generate_response(prompt: str, user_id: str) -> str:
+    """Réponse complète (sans streaming) : concaténation de stream_response."""
+    return "".join(stream_response(prompt, user_id))
 
 
 
@@ -284,16 +402,15 @@ def main():
                 if st.button("🔄 Rafraîchir l'emploi du temps"):
                     with st.spinner("Mise à jour en cours..."):
                         try:
+                            from scrap_edt import get_edt_semaine
+                            # get_edt_semaine sauvegarde lui-même le fichier (et ne le réécrit pas s'il est inchangé)
                             result = get_edt_semaine(user_id)
-                            # Sauvegarder le résultat
-                            json_dir = "json_schedules"
-                            os.makedirs(json_dir, exist_ok=True)
-                            json_file = os.path.join(json_dir, f"{user_id}_edt.json")
+                            metadata = result.get("metadata", {})
                             
-                            with open(json_file, 'w', encoding='utf-8') as f:
-                                json.dump(result, f, indent=2, ensure_ascii=False)
-                            
-                            st.success(f"✅ EDT mis à jour ! {result['metadata']['stats']['processed']} cours trouvés")
+                            if metadata.get("unchanged"):
+                                st.info("✅ Emploi du temps déjà à jour")
+                            else:
+                                st.success(f"✅ EDT mis à jour ! {metadata.get('stats', {}).get('processed', 0)} cours trouvés")
                         except Exception as e:
                             st.error(f"❌ Erreur: {e}")
                     st.rerun()
@@ -308,60 +425,57 @@ def main():
             
             # S'assurer que les données existent et afficher le calendrier
             if ensure_schedule_data(user_id):
-                schedule_data = load_schedule_data(user_id)
+                from schedule_functions import get_calendar_view
+                # Événements et statistiques construits une fois par version du fichier
+                calendar_view = get_calendar_view(user_id)
+                schedule_data = calendar_view["events"] if calendar_view else []
                 
                 if schedule_data:
-                    # Configuration du calendrier
-                    calendar_options = {
-                        "editable": False,
-                        "selectable": True,
-                        "locale": "fr",
-                        "firstDay": 1,
-                        "headerToolbar": {
-                            "left": "prev,next today",
-                            "center": "title",
-                            "right": "dayGridMonth,timeGridWeek,timeGridDay"
-                        },
-                        "buttonText": {
-                            "today": "Aujourd'hui",
-                            "month": "Mois", 
-                            "week": "Semaine",
-                            "day": "Jour"
-                        },
-                        "initialView": "timeGridWeek",
-                        "height": 650,
-                        "slotMinTime": "07:00:00",
-                        "slotMaxTime": "19:00:00",
-                        "allDaySlot": False,
-                        "weekends": True,
-                        "nowIndicator": True,
-                        "eventDisplay": "block",
-                        "displayEventTime": True,
-                        "eventTimeFormat": {
-                            "hour": "2-digit",
-                            "minute": "2-digit", 
-                            "meridiem": False
-                        }
-                    }
+                    # Période affichée (conservée entre les reruns) et navigation
+                    st.session_state.setdefault("calendar_date", date.today())
+                    nav_prev, nav_today, nav_next, nav_view = st.columns([1, 2, 1, 4])
+                    with nav_view:
+                        view = CALENDAR_VIEWS[st.radio("Vue", list(CALENDAR_VIEWS), horizontal=True,
+                                                       label_visibility="collapsed", key="calendar_view")]
+                    with nav_prev:
+                        if st.button("◀", key="calendar_prev"):
+                            st.session_state.calendar_date = shift_calendar_date(view, st.session_state.calendar_date, -1)
+                    with nav_today:
+                        if st.button("Aujourd'hui", key="calendar_today"):
+                            st.session_state.calendar_date = date.today()
+                    with nav_next:
+                        if st.button("▶", key="calendar_next"):
+                            st.session_state.calendar_date = shift_calendar_date(view, st.session_state.calendar_date, 1)
+                    
+                    # Seuls les événements de la période affichée (plus une marge) sont envoyés au composant
+                    from schedule_functions import get_calendar_window
+                    first_day, last_day = visible_range(view, st.session_state.calendar_date)
+                    margin = timedelta(days=CALENDAR_PREFETCH_DAYS)
+                    window_events = get_calendar_window(
+                        user_id,
+                        datetime.combine(first_day - margin, datetime.min.time()),
+                        datetime.combine(last_day + margin, datetime.min.time())
+                    )
                     
-                    # Affichage du calendrier
+                    # Affichage du calendrier (remonté quand la vue ou la date change)
+                    from streamlit_calendar import calendar
                     calendar_result = calendar(
-                        events=schedule_data,
-                        options=calendar_options,
+                        events=window_events,
+                        options={**CALENDAR_OPTIONS, "initialView": view,
+                                 "initialDate": st.session_state.calendar_date.isoformat()},
                         custom_css=custom_css_outside
                     )
                     
                     # Statistiques
-                    total_events = len(schedule_data)
-                    ai_events = len([e for e in schedule_data if e.get("extendedProps", {}).get("added_by_ai")])
+                    stats = calendar_view["stats"]
                     
                     col_stat1, col_stat2, col_stat3 = st.columns(3)
                     with col_stat1:
-                        st.metric("Total événements", total_events)
+                        st.metric("Total événements", stats["total"])
                     with col_stat2:
-                        st.metric("Cours", total_events - ai_events) 
+                        st.metric("Cours", stats["courses"]) 
                     with col_stat3:
-                        st.metric("Révisions ajoutées", ai_events, delta=ai_events if ai_events > 0 else None)
+                        st.metric("Révisions ajoutées", stats["ai"], delta=stats["ai"] if stats["ai"] > 0 else None)
                         
                     # Debug temporaire - à supprimer après vérification
                     if st.checkbox("🔍 Mode debug"):
@@ -369,7 +483,8 @@ def main():
                             if schedule_data:
                                 st.json(schedule_data[:2])  # Affiche les 2 premiers événements
                         
-                        st.info(f"📊 {len(schedule_data)} événements chargés pour le calendrier")
+                        st.info(f"📊 {len(schedule_data)} événements chargés, {len(window_events)} envoyés au calendrier "
+                                f"({first_day} → {last_day}, marge {CALENDAR_PREFETCH_DAYS} j)")
                         
                 else:
                     st.error("❌ Aucun cours trouvé dans le fichier")
@@ -395,14 +510,53 @@ def main():
             if prompt := st.chat_input("Que voulez-vous réviser ?"):
                 st.session_state.messages.append({"role": "user", "content": prompt})
 
-                with st.spinner("🤔 Analyse en cours..."):
-                    response = generate_response(prompt, user_id=user_id)
+                # Affichage au fil de l'eau : le texte apparaît dès les premiers tokens
+                with messages_container:
+                    with st.chat_message("user"):
+                        st.markdown(prompt)
+                    with st.chat_message("assistant"):
+                        response = st.write_stream(stream_response(prompt, user_id=user_id))
 
                 st.session_state.messages.append({"role": "assistant", "content": response})
                 st.rerun()
         else:
             st.info("La discussion s'affichera ici")
 
+# Configuration du calendrier (identique à chaque rerun)
+CALENDAR_OPTIONS = {
+    "editable": False,
+    "selectable": True,
+    "locale": "fr",
+    "firstDay": 1,
+    # Navigation et choix de la vue par les contrôles Streamlit : chaque période
+    # affichée reçoit ses propres événements (voir main)
+    "headerToolbar": {
+        "left": "",
+        "center": "title",
+        "right": ""
+    },
+    "buttonText": {
+        "today": "Aujourd'hui",
+        "month": "Mois", 
+        "week": "Semaine",
+        "day": "Jour"
+    },
+    "initialView": "timeGridWeek",
+    "height": 650,
+    "slotMinTime": "07:00:00",
+    "slotMaxTime": "19:00:00",
+    "allDaySlot": False,
+    "weekends": True,
+    "nowIndicator": True,
+    "eventDisplay": "block",
+    "displayEventTime": True,
+    "eventTimeFormat": {
+        "hour": "2-digit",
+        "minute": "2-digit", 
+        "meridiem": False
+    }
+}
+
 custom_css_outside = """
 /* Thème sombre moderne */
 .fc {
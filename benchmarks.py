@@ -0,0 +1,312 @@
+"""
+Benchmarks de performance du projet.
+
+Usage :
+    python benchmarks.py ics [--events 3000] [--file flux.ics]
+    python benchmarks.py ann [--vectors 20000] [--dim 256] [--index HNSW32 --index IVF256,Flat]
+    python benchmarks.py retrieval [--users 20] [--events 500] [--threads 4]   (hors ligne, backend local)
+    python benchmarks.py imports [--module app --module tools] [--top 10]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+
+def _measure(func, *args, repeat: int = 3):
+    """Retourne (meilleur temps en secondes, pic mémoire en octets, résultat)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+# === INGESTION ICS ===
+
+def synthetic_ics(n_events: int) -> bytes:
+    """Flux ICS proche de celui de l'université (UTC, descriptions multi-lignes, lignes repliées)."""
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//EdtWeb//FR"]
+    start = datetime(2025, 2, 10, 20, 0)
+    for i in range(n_events):
+        begin = start + timedelta(hours=2 * i)
+        end = begin + timedelta(hours=1, minutes=30)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:event-{i}@univ-nc.nc",
+            "DTSTAMP:20250101T000000Z",
+            f"DTSTART:{begin:%Y%m%dT%H%M%S}Z",
+            f"DTEND:{end:%Y%m%dT%H%M%S}Z",
+            f"SUMMARY:Cm : Microéco {i % 7} \\nG.Lagadec  \\nAte : A7 [Edt-Ens] (groupe {i % 3})",
+            f"DESCRIPTION:Cours magistral de microéconomie numéro {i}\\nG.Lagadec\\nSalle A7 - ",
+            " bâtiment principal (rattrapage)",
+            "LOCATION:Amphi Baco",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(lines) + "\r\n").encode("utf-8")
+
+
+def _ingest_with_ics_library(body: bytes):
+    """Ancien chemin : ics.Calendar matérialise tout le calendrier (objets arrow par événement)."""
+    from ics import Calendar
+
+    local_tz = pytz.timezone("Pacific/Noumea")
+    return [
+        (event.name, event.description, event.location,
+         event.begin.astimezone(local_tz).strftime('%Y-%m-%d %H:%M'),
+         event.end.astimezone(local_tz).strftime('%Y-%m-%d %H:%M'))
+        for event in Calendar(body.decode("utf-8")).events
+    ]
+
+
+def _ingest_streaming(body: bytes, chunk_size: int = 64 * 1024):
+    """Nouveau chemin : ics_parser lit le flux par morceaux et ne garde que les champs utiles."""
+    from ics_parser import iter_ics_lines, iter_vevents
+
+    chunks = (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+    return [
+        (event["summary"], event["description"], event["location"],
+         event["begin"].strftime('%Y-%m-%d %H:%M'), event["end"].strftime('%Y-%m-%d %H:%M'))
+        for event in iter_vevents(iter_ics_lines(chunks), pytz.timezone("Pacific/Noumea"))
+    ]
+
+
+def bench_ics(args):
+    if args.file:
+        with open(args.file, "rb") as f:
+            body = f.read()
+    else:
+        body = synthetic_ics(args.events)
+    print(f"Flux ICS : {len(body) / 1024:.0f} Ko")
+
+    rows = []
+    results = {}
+    for name, func in [("ics.Calendar", _ingest_with_ics_library), ("ics_parser (flux)", _ingest_streaming)]:
+        duration, peak, result = _measure(func, body, repeat=args.repeat)
+        results[name] = sorted(result, key=lambda r: r[3])
+        rows.append((name, len(result), duration, len(result) / duration, peak / 1024 / 1024))
+
+    print(f"{'Chemin':<20} {'Événements':>10} {'Temps (s)':>10} {'Év./s':>10} {'Pic mémoire (Mo)':>17}")
+    for name, count, duration, throughput, peak in rows:
+        print(f"{name:<20} {count:>10} {duration:>10.3f} {throughput:>10.0f} {peak:>17.1f}")
+    print(f"Gain : x{rows[0][2] / rows[1][2]:.1f} en temps, x{rows[0][4] / rows[1][4]:.1f} en mémoire")
+
+    identical = results["ics.Calendar"] == results["ics_parser (flux)"]
+    print(f"Résultats identiques : {'oui' if identical else 'NON'}")
+
+
+# === INDEX FAISS (ANN) ===
+
+ANN_INDEXES = ["Flat", "SQfp16", "SQ8", "HNSW32", "HNSW32,SQ8", "IVF256,Flat", "IVF256,PQ32"]
+
+
+def synthetic_vectors(n_vectors: int, dim: int, n_clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Vecteurs regroupés en clusters, plus proches de vrais embeddings qu'un bruit uniforme."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, n_clusters, n_vectors)] + 0.3 * rng.normal(size=(n_vectors, dim)).astype(np.float32)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def bench_ann(args):
+    import faiss
+    from faiss_handler import build_index, search_parameters
+
+    data = synthetic_vectors(args.vectors + args.queries, args.dim)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    print(f"{args.vectors} vecteurs de dimension {args.dim}, {args.queries} requêtes, k={args.k}")
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{'Index':<14} {'Construction (s)':>16} {'Taille (Mo)':>12} {'Latence (ms)':>13} {'Rappel@k':>9}")
+    for spec in args.index or ANN_INDEXES:
+        start = time.perf_counter()
+        index = build_index(args.dim, vectors, factory=spec)
+        index.add(vectors)
+        build = time.perf_counter() - start
+        size = faiss.serialize_index(index).nbytes / 1024 / 1024
+
+        params = search_parameters(index)
+        latency = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for query in queries:
+                _, labels = index.search(query.reshape(1, -1), args.k, params=params)
+            latency = min(latency, (time.perf_counter() - start) / len(queries))
+        _, labels = index.search(queries, args.k, params=params)
+
+        recall = np.mean([len(set(found) & set(expected)) / args.k for found, expected in zip(labels, truth)])
+        print(f"{spec:<14} {build:>16.2f} {size:>12.1f} {latency * 1000:>13.3f} {recall:>9.3f}")
+
+
+# === INGESTION / RECHERCHE FAISS (HORS LIGNE) ===
+
+_COURSES = [("Cm : Microéco", "G.Lagadec"), ("Td : Statistiques", "A.Chung"),
+            ("Cm : Economie et Ressources Naturelles", "S.Blaise"), ("Tp : Python", "R.Martin"),
+            ("Cm : Evaluation des Politiques Publiques", "S.Blaise"), ("Td : Droit des contrats", "L.Petit")]
+
+
+def synthetic_documents(n_users: int, n_events: int, seed: int = 0):
+    """Documents au format de faiss_handler.json_to_documents (un cours par document)."""
+    from langchain_core.documents import Document
+    from faiss_handler import event_document_id
+
+    rng = random.Random(seed)
+    documents = []
+    for u in range(n_users):
+        user_id = f"user{u:03d}"
+        for i in range(n_events):
+            course, professor = rng.choice(_COURSES)
+            begin = datetime(2025, 2, 10, 7, 30) + timedelta(days=i // 4, hours=2 * (i % 4))
+            record = {"nom_cours": f"{course} {i % 5} \n{professor}  \nAte : A{i % 9} [Edt-Ens]",
+                      "début": f"{begin:%Y-%m-%d %H:%M}", "fin": f"{begin + timedelta(hours=2):%Y-%m-%d %H:%M}",
+                      "professeur": professor}
+            documents.append(Document(page_content=json.dumps(record), metadata={
+                "date": begin.date().isoformat(), "user_id": user_id,
+                "event_id": event_document_id(user_id, record["début"], record["nom_cours"], record["fin"])}))
+    return documents
+
+
+def bench_retrieval(args):
+    # Backend local : aucun appel réseau, vecteurs déterministes
+    os.environ.setdefault("EMBEDDING_BACKEND", "local")
+    import logging
+    import faiss_handler
+
+    logging.getLogger().setLevel(logging.WARNING)
+    faiss_handler.FAISS_PATH = tempfile.mkdtemp(prefix="bench_faiss_")
+    print(f"Backend {faiss_handler.EMBEDDING_BACKEND}, dimension {faiss_handler.EMBEDDING_DIMENSIONS}, "
+          f"index {faiss_handler.index_factory_string()}, {args.users} utilisateurs x {args.events} cours")
+
+    documents = synthetic_documents(args.users, args.events)
+    start = time.perf_counter()
+    faiss_handler.save_to_faiss(documents, remove_missing=True)
+    build = time.perf_counter() - start
+    print(f"save_to_faiss (création)   : {build:.2f}s, {len(documents) / build:.0f} documents/s")
+
+    start = time.perf_counter()
+    faiss_handler.save_to_faiss(documents, remove_missing=True)
+    print(f"save_to_faiss (inchangé)   : {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(1)
+    days = sorted({document.metadata["date"] for document in documents})
+    queries = []
+    for _ in range(args.queries):
+        first = rng.randrange(len(days) - 7)
+        queries.append((rng.choice(["cours de microéco", "td statistiques", "salle A7", "python"]),
+                        {"date": days[first:first + rng.choice([1, 7])]}, f"user{rng.randrange(args.users):03d}"))
+
+    def run(query):
+        started = time.perf_counter()
+        faiss_handler.retrieve_documents(query[0], query[1], query[2], top_k=args.k)
+        return time.perf_counter() - started
+
+    latencies = sorted(run(query) for query in queries)
+    print(f"retrieve_documents (1 thread) : p50 {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(run, queries))
+    print(f"retrieve_documents ({args.threads} threads) : {len(queries) / (time.perf_counter() - start):.0f} requêtes/s")
+
+
+# === TEMPS D'IMPORT ===
+
+IMPORT_MODULES = ["app", "tools", "faiss_handler", "scrap_edt", "schedule_functions"]
+
+
+def import_profile(module: str):
+    """
+    Importe `module` dans un processus neuf avec `python -X importtime`.
+    Retourne (temps total en s, [(cumul en s, nom du module)] triés par cumul décroissant).
+    """
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    total = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    entries = []
+    for line in completed.stderr.splitlines():
+        # "import time:      self [us] |    cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Seuls les imports de premier niveau sous le module (indentation de 1 ou 2 espaces)
+        if len(name) - len(name.lstrip()) <= 3:
+            entries.append((int(cumulative) / 1e6, name.strip()))
+    return total, sorted(entries, reverse=True)
+
+
+def bench_imports(args):
+    for module in args.module or IMPORT_MODULES:
+        try:
+            total, entries = import_profile(module)
+        except RuntimeError as e:
+            print(f"{module:<20} import impossible : {e}")
+            continue
+        own = next((seconds for seconds, name in entries if name == module), 0.0)
+        print(f"{module:<20} import {own:6.2f}s (processus complet {total:.2f}s)")
+        for seconds, name in [entry for entry in entries if entry[1] != module][:args.top]:
+            print(f"    {seconds:6.3f}s  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de performance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ics_cmd = subparsers.add_parser("ics", help="Ingestion ICS : ics.Calendar vs parseur en flux")
+    ics_cmd.add_argument("--events", type=int, default=3000, help="Nombre d'événements du flux synthétique")
+    ics_cmd.add_argument("--file", help="Fichier .ics réel à utiliser à la place du flux synthétique")
+    ics_cmd.add_argument("--repeat", type=int, default=3)
+    ics_cmd.set_defaults(func=bench_ics)
+
+    ann_cmd = subparsers.add_parser("ann", help="Index FAISS : Flat vs HNSW / IVF / PQ / SQ8 (latence, rappel@k)")
+    ann_cmd.add_argument("--vectors", type=int, default=20000)
+    ann_cmd.add_argument("--dim", type=int, default=256)
+    ann_cmd.add_argument("--queries", type=int, default=200)
+    ann_cmd.add_argument("--k", type=int, default=10)
+    ann_cmd.add_argument("--index", action="append", help=f"Chaîne index_factory (répétable, défaut : {', '.join(ANN_INDEXES)})")
+    ann_cmd.add_argument("--repeat", type=int, default=3)
+    ann_cmd.set_defaults(func=bench_ann)
+
+    retrieval_cmd = subparsers.add_parser("retrieval", help="save_to_faiss / retrieve_documents hors ligne (backend local)")
+    retrieval_cmd.add_argument("--users", type=int, default=20)
+    retrieval_cmd.add_argument("--events", type=int, default=500, help="Cours par utilisateur")
+    retrieval_cmd.add_argument("--queries", type=int, default=1000)
+    retrieval_cmd.add_argument("--k", type=int, default=10)
+    retrieval_cmd.add_argument("--threads", type=int, default=4)
+    retrieval_cmd.set_defaults(func=bench_retrieval)
+
+    imports_cmd = subparsers.add_parser("imports", help="Temps d'import à froid des modules (python -X importtime)")
+    imports_cmd.add_argument("--module", action="append", help=f"Module à profiler (répétable, défaut : {', '.join(IMPORT_MODULES)})")
+    imports_cmd.add_argument("--top", type=int, default=8, help="Nombre de dépendances les plus lentes affichées")
+    imports_cmd.set_defaults(func=bench_imports)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Construction du contexte envoyé au modèle, sous budget de tokens.
+
+Ordre des messages (du plus stable au plus variable, pour que le préfixe reste
+identique d'un appel à l'autre et profite du cache de prompt du fournisseur) :
+
+    1. règles fixes (SYSTEM_PROMPT_RULES, octet pour octet identiques)
+    2. mémoire de la conversation : résumé des échanges anciens, complété au fil de l'eau
+    3. derniers échanges, repris tels quels dans la limite de CONTEXT_HISTORY_TOKENS
+    4. contexte variable (utilisateur, date, heure)
+    5. question courante
+
+Le résumé est extractif (début de chaque question et de chaque réponse) : il ne coûte
+aucun appel au modèle et chaque message n'est résumé qu'une fois.
+"""
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from embedding_pipeline import count_tokens
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_HISTORY_TOKENS = int(os.getenv("CONTEXT_HISTORY_TOKENS", "1500"))
+CONTEXT_MEMORY_TOKENS = int(os.getenv("CONTEXT_MEMORY_TOKENS", "400"))
+# Un message repris de l'historique est coupé au-delà de cette taille
+CONTEXT_MESSAGE_TOKENS = int(os.getenv("CONTEXT_MESSAGE_TOKENS", "600"))
+MEMORY_LINE_CHARS = 160
+
+_ROLE_LABELS = {"user": "Utilisateur", "assistant": "Assistant"}
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Début du texte tenant dans max_tokens (coupé sur un espace, marqué par '…')."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    return (cut.rsplit(" ", 1)[0] if " " in cut else cut) + " …"
+
+
+def _memory_line(message: Dict[str, str]) -> str:
+    text = " ".join((message.get("content") or "").split())
+    if len(text) > MEMORY_LINE_CHARS:
+        text = text[:MEMORY_LINE_CHARS].rsplit(" ", 1)[0] + " …"
+    return f"- {_ROLE_LABELS.get(message['role'], message['role'])} : {text}"
+
+
+class ConversationMemory:
+    """
+    Résumé glissant des échanges sortis de la fenêtre d'historique. Les lignes ne sont
+    qu'ajoutées (préfixe stable) ; les plus anciennes sont oubliées au-delà du budget.
+    """
+
+    def __init__(self, max_tokens: int = CONTEXT_MEMORY_TOKENS):
+        self.max_tokens = max_tokens
+        self.lines: List[str] = []
+        self.covered = 0  # nombre de messages de l'historique déjà résumés
+
+    def update(self, history: List[Dict[str, str]], keep_from: int) -> None:
+        if self.covered > len(history):
+            # Historique effacé (nouvelle conversation)
+            self.lines, self.covered = [], 0
+        for message in history[self.covered:keep_from]:
+            self.lines.append(_memory_line(message))
+        if keep_from > self.covered:
+            logger.info(f"🧠 {keep_from - self.covered} message(s) ancien(s) résumé(s) dans la mémoire")
+        self.covered = max(self.covered, keep_from)
+        while self.lines and count_tokens("\n".join(self.lines)) > self.max_tokens:
+            self.lines.pop(0)
+
+    def text(self) -> Optional[str]:
+        if not self.lines:
+            return None
+        return "🧠 RÉSUMÉ DES ÉCHANGES PRÉCÉDENTS :\n" + "\n".join(self.lines)
+
+
+def _recent_start(history: List[Dict[str, str]], budget: int, floor: int) -> int:
+    """
+    Premier message repris tel quel : les plus récents tant que le budget le permet,
+    et toujours le dernier échange (une relance comme "oui, ajoute-les" en dépend).
+    """
+    used = 0
+    start = len(history)
+    while start > floor:
+        cost = min(count_tokens(history[start - 1].get("content") or ""), CONTEXT_MESSAGE_TOKENS)
+        if used + cost > budget and start <= len(history) - 2:
+            break
+        used += cost
+        start -= 1
+    return start
+
+
+def build_messages(rules: str, dynamic_context: str, history: List[Dict[str, str]], prompt: str,
+                   memory: ConversationMemory, history_tokens: int = CONTEXT_HISTORY_TOKENS) -> List[Dict[str, Any]]:
+    """Messages du premier appel au modèle pour `prompt` (voir l'ordre en tête de module)."""
+    # La question courante est déjà ajoutée à l'historique affiché
+    if history and history[-1].get("role") == "user" and history[-1].get("content") == prompt:
+        history = history[:-1]
+    history = [message for message in history if message.get("role") in _ROLE_LABELS]
+
+    keep_from = _recent_start(history, history_tokens, min(memory.covered, len(history)))
+    memory.update(history, keep_from)
+
+    messages = [{"role": "system", "content": rules}]
+    summary = memory.text()
+    if summary:
+        messages.append({"role": "system", "content": summary})
+    for message in history[keep_from:]:
+        messages.append({"role": message["role"],
+                         "content": truncate_to_tokens(message["content"] or "", CONTEXT_MESSAGE_TOKENS)})
+    messages.append({"role": "system", "content": dynamic_context})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def dedupe_tool_content(messages: List[Dict[str, Any]], content: str) -> str:
+    """
+    Contenu d'un nouveau message "tool" : si un résultat identique est déjà dans le
+    contexte (même outil rappelé avec les mêmes arguments), on y renvoie au lieu de le répéter.
+    """
+    for message in messages:
+        if message.get("role") == "tool" and message.get("content") == content:
+            return f'{{"identique_a":"{message["tool_call_id"]}"}}'
+    return content
+
+
+def count_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Estimation des tokens d'entrée (contenus et arguments des tool calls, hors définitions d'outils)."""
+    total = 0
+    for message in messages:
+        total += 4 + count_tokens(message.get("content") or "")
+        for call in message.get("tool_calls") or []:
+            total += count_tokens(call["function"]["name"] + call["function"]["arguments"])
+    return total
@@ -0,0 +1,96 @@
+"""
+Expressions de date des questions en français ("demain", "cette semaine", "jeudi",
+"14/02", "ce soir"...), partagées par le routeur d'intentions et le cache de réponses.
+
+tokenize() découpe une question en mots normalisés (minuscules, sans accents) où
+chaque expression de date est remplacée par un TimeExpression : période (début, fin
+incluse), libellé lisible et forme canonique (key) qui distingue un jour d'une semaine.
+"""
+from datetime import date, timedelta
+import re
+import unicodedata
+from typing import List, NamedTuple, Optional, Union
+
+JOURS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+# Début de "ce soir"
+EVENING_START = "17:00"
+
+# Expressions de plusieurs mots réunies en un seul mot avant le découpage
+_COMPOUNDS = [
+    ("aujourd hui", "aujourdhui"),
+    ("apres-demain", "apresdemain"),
+    ("apres demain", "apresdemain"),
+    ("semaine prochaine", "semaineprochaine"),
+    ("cette semaine", "cettesemaine"),
+    ("ce soir", "cesoir"),
+]
+_TOKEN_RE = re.compile(r"[a-z0-9/-]+")
+_DATE_RE = re.compile(r"^(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?$")
+
+
+def strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def format_day(day: date) -> str:
+    """'jeudi 13/02'."""
+    return f"{JOURS[day.weekday()]} {day.day:02d}/{day.month:02d}"
+
+
+class TimeExpression(NamedTuple):
+    start: date
+    end: date
+    label: str
+    # Heure de début ("HH:MM") quand seule une partie de la journée est demandée ("ce soir")
+    from_time: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        """'2025-02-10', '2025-02-10..2025-02-16' ou '2025-02-10T17:00' (à partir de 17h)."""
+        if self.from_time:
+            return f"{self.start.isoformat()}T{self.from_time}"
+        if self.start == self.end:
+            return self.start.isoformat()
+        return f"{self.start.isoformat()}..{self.end.isoformat()}"
+
+
+def _day(day: date, label: Optional[str] = None) -> TimeExpression:
+    return TimeExpression(day, day, label or format_day(day))
+
+
+def _parse_token(token: str, today: date) -> Optional[TimeExpression]:
+    week_start = today - timedelta(days=today.weekday())
+    if token == "aujourdhui":
+        return _day(today, "aujourd'hui")
+    if token == "cesoir":
+        return TimeExpression(today, today, "ce soir", EVENING_START)
+    if token == "demain":
+        return _day(today + timedelta(days=1), "demain")
+    if token == "apresdemain":
+        return _day(today + timedelta(days=2), "après-demain")
+    if token == "cettesemaine":
+        return TimeExpression(week_start, week_start + timedelta(days=6), "cette semaine")
+    if token == "semaineprochaine":
+        return TimeExpression(week_start + timedelta(days=7), week_start + timedelta(days=13), "la semaine prochaine")
+    if token in JOURS:
+        # "jeudi" = le prochain jeudi (aujourd'hui si c'est jeudi)
+        return _day(today + timedelta(days=(JOURS.index(token) - today.weekday()) % 7))
+    match = _DATE_RE.match(token)
+    if match:
+        day_part, month_part, year_part = match.groups()
+        year = int(year_part) if year_part else today.year
+        year += 2000 if year < 100 else 0
+        try:
+            return _day(date(year, int(month_part), int(day_part)))
+        except ValueError:
+            return None
+    return None
+
+
+def tokenize(prompt: str, today: date) -> List[Union[str, TimeExpression]]:
+    """Mots normalisés de la question, les expressions de date remplacées par des TimeExpression."""
+    text = strip_accents(prompt.lower()).replace("'", " ").replace("’", " ")
+    for words, compound in _COMPOUNDS:
+        text = text.replace(words, compound)
+    return [_parse_token(token, today) or token for token in _TOKEN_RE.findall(text)]
@@ -0,0 +1,100 @@
+"""
+Backends d'embeddings interchangeables (variable d'environnement EMBEDDING_BACKEND).
+
+    openai   OpenAIEmbeddings (text-embedding-3-large), appel réseau payant
+    local    HashedNgramEmbeddings : hachage de mots et de n-grammes de caractères,
+             déterministe, sans réseau ni modèle à télécharger (benchmarks, mode économique)
+
+Tous les backends implémentent l'interface langchain Embeddings
+(embed_documents / embed_query) et peuvent donc être passés au vector store FAISS.
+"""
+import re
+import unicodedata
+import zlib
+from typing import Callable, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-large"
+OPENAI_FULL_DIMENSIONS = 3072
+LOCAL_DIMENSIONS = 1024
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _normalize(text: str) -> str:
+    """Minuscules sans accents : 'Microéco' et 'microeco' partagent leurs n-grammes."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class HashedNgramEmbeddings(Embeddings):
+    """
+    Embeddings locaux façon TF-IDF haché : mots et n-grammes de caractères (3 à 5) de
+    chaque mot sont projetés dans `dimensions` cases par crc32 (avec un signe pour
+    limiter les collisions), pondérés par 1 + log(tf) puis normalisés (norme L2).
+
+    Le résultat ne dépend que du texte : deux processus produisent les mêmes vecteurs.
+    """
+
+    def __init__(self, dimensions: int = LOCAL_DIMENSIONS, ngram_range=(3, 5)):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        low, high = self.ngram_range
+        for word in _WORD_RE.findall(_normalize(text)):
+            features.append(word)
+            padded = f"<{word}>"
+            for n in range(low, high + 1):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        features = self._features(text)
+        if not features:
+            return vector
+        hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features),
+                             dtype=np.uint64, count=len(features))
+        buckets, counts = np.unique(hashes, return_counts=True)
+        signs = np.where((buckets >> np.uint64(31)) & np.uint64(1), -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, (buckets % np.uint64(self.dimensions)).astype(np.int64),
+                  signs * (1.0 + np.log(counts)).astype(np.float32))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text).tolist()
+
+
+def _openai_embeddings(dimensions: int) -> Embeddings:
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(
+        model=OPENAI_EMBEDDING_MODEL,
+        # Les modèles text-embedding-3 acceptent des vecteurs raccourcis
+        dimensions=dimensions if dimensions != OPENAI_FULL_DIMENSIONS else None
+    )
+
+
+EMBEDDING_BACKENDS: Dict[str, Callable[[int], Embeddings]] = {
+    "openai": _openai_embeddings,
+    "local": HashedNgramEmbeddings,
+}
+DEFAULT_DIMENSIONS = {"openai": OPENAI_FULL_DIMENSIONS, "local": LOCAL_DIMENSIONS}
+# Backends appelant une API distante : cache disque et limiteur de débit utiles
+REMOTE_BACKENDS = {"openai"}
+
+
+def create_embeddings(backend: str, dimensions: int) -> Embeddings:
+    try:
+        factory = EMBEDDING_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend d'embeddings inconnu : {backend} ({', '.join(EMBEDDING_BACKENDS)})")
+    return factory(dimensions)
@@ -0,0 +1,113 @@
+from collections import defaultdict
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_pipeline import iter_embeddings
+
+
+def content_hash(text: str) -> str:
+    """Hash stable du contenu d'un document (indépendant du modèle)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache disque (SQLite) des embeddings, adressé par le contenu.
+
+    La clé est le hash du nom du modèle et du texte : un texte déjà vu n'est jamais
+    ré-embeddé, quel que soit l'utilisateur ou le document qui le contient.
+    Les vecteurs sont stockés en float32 brut.
+    """
+
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, dim INTEGER, vector BLOB)"
+        )
+        self._connection.commit()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Vecteurs déjà en cache, par texte."""
+        keys = {self.key(text): text for text in texts}
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            # SQLite limite le nombre de paramètres d'une requête
+            for i in range(0, len(key_list), 500):
+                batch = key_list[i:i + 500]
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[keys[key]] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        rows = []
+        for text, vector in zip(texts, vectors):
+            array = np.asarray(vector, dtype=np.float32)
+            rows.append((self.key(text), self.model, len(array), array.tobytes()))
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._connection.commit()
+
+    def iter_embed_documents(self, texts: List[str], embeddings) -> Iterator[Tuple[List[int], np.ndarray]]:
+        """
+        Embeddings des textes par morceaux (positions dans texts, vecteurs) : d'abord ceux
+        du cache, puis les manquants à mesure que leurs lots sont calculés (et mis en cache).
+        """
+        cached = self.get_many(texts)
+        positions = defaultdict(list)
+        for position, text in enumerate(texts):
+            positions[text].append(position)
+        missing = [text for text in positions if text not in cached]
+        logging.info(f"{len(missing)} embedding(s) à calculer, {len(texts) - sum(len(positions[t]) for t in missing)} lu(s) en cache")
+
+        hits = [position for text, found in positions.items() if text in cached for position in found]
+        if hits:
+            yield hits, np.stack([cached[texts[position]] for position in hits])
+
+        for batch, vectors in iter_embeddings(missing, embeddings.embed_documents):
+            batch_texts = [missing[i] for i in batch]
+            self.put_many(batch_texts, vectors)
+            # Un texte présent plusieurs fois reçoit le même vecteur à chacune de ses positions
+            expanded = [(position, vector) for text, vector in zip(batch_texts, vectors) for position in positions[text]]
+            yield [position for position, _ in expanded], np.stack([vector for _, vector in expanded])
+
+    def embed_documents(self, texts: List[str], embeddings) -> List[np.ndarray]:
+        """Embeddings des textes : lus en cache, seuls les manquants sont calculés (puis mis en cache)."""
+        result: List[Optional[np.ndarray]] = [None] * len(texts)
+        for batch, vectors in self.iter_embed_documents(texts, embeddings):
+            for position, vector in zip(batch, vectors):
+                result[position] = vector
+        return result
+
+
+_caches: Dict[tuple, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(path: str, model: str) -> Optional[EmbeddingCache]:
+    """Cache partagé par chemin/modèle (None si la base SQLite ne peut pas être ouverte)."""
+    with _caches_lock:
+        cache = _caches.get((path, model))
+        if cache is None:
+            try:
+                cache = _caches[(path, model)] = EmbeddingCache(path, model)
+            except sqlite3.Error as e:
+                logging.error(f"Cache d'embeddings indisponible ({path}) : {repr(e)}")
+                return None
+        return cache
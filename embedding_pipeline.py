@@ -0,0 +1,166 @@
+"""
+Calcul des embeddings par lots, en parallèle, sous limite de débit de l'API.
+
+Les textes sont regroupés en lots bornés en tokens et en nombre d'entrées, envoyés
+par plusieurs threads (pool partagé par tout le processus) et les lots terminés sont
+rendus au fil de l'eau, dans leur ordre d'arrivée.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Réglages (surchargeables par variables d'environnement)
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "50000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "512"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_RPM = float(os.getenv("EMBEDDING_RPM", "3000"))
+EMBEDDING_TPM = float(os.getenv("EMBEDDING_TPM", "1000000"))
+EMBEDDING_RETRIES = int(os.getenv("EMBEDDING_RETRIES", "5"))
+EMBEDDING_BACKOFF = float(os.getenv("EMBEDDING_BACKOFF", "1.0"))
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Encodage tiktoken, chargé au premier comptage (None si tiktoken est indisponible)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # tiktoken absent ou encodage non téléchargeable : estimation
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de tokens du texte (tiktoken si disponible, sinon environ 4 caractères par token)."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def make_batches(token_counts: Sequence[int], max_tokens: int = EMBEDDING_BATCH_TOKENS,
+                 max_items: int = EMBEDDING_BATCH_SIZE) -> List[List[int]]:
+    """Découpe les positions 0..n-1 en lots dont la somme des tokens et la taille sont bornées."""
+    batches, current, current_tokens = [], [], 0
+    for position, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(position)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class RateLimiter:
+    """
+    Double seau à jetons (requêtes/minute et tokens/minute) partagé entre threads.
+    acquire() bloque jusqu'à ce que la requête puisse partir sans dépasser les quotas.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = requests_per_minute
+        self._tokens = tokens_per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int) -> None:
+        # Un lot plus gros que le quota par minute passe quand le seau est plein
+        tokens = min(tokens, self.tpm) if self.tpm > 0 else 0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                missing_requests = 1 - self._requests if self.rpm > 0 else 0
+                missing_tokens = tokens - self._tokens if self.tpm > 0 else 0
+                if missing_requests <= 0 and missing_tokens <= 0:
+                    self._requests -= 1 if self.rpm > 0 else 0
+                    self._tokens -= tokens
+                    return
+                delay = max(missing_requests * 60 / self.rpm if missing_requests > 0 else 0,
+                            missing_tokens * 60 / self.tpm if missing_tokens > 0 else 0)
+            time.sleep(delay)
+
+
+_rate_limiter = RateLimiter(EMBEDDING_RPM, EMBEDDING_TPM)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Pool de threads partagé : la concurrence totale reste bornée, même pour plusieurs ingestions simultanées."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY, thread_name_prefix="embeddings")
+        return _executor
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _embed_batch(embed: Callable[[List[str]], List[List[float]]], texts: List[str], tokens: int,
+                 limiter: RateLimiter, retries: int, backoff: float) -> np.ndarray:
+    for attempt in range(retries + 1):
+        limiter.acquire(tokens)
+        try:
+            return np.asarray(embed(texts), dtype=np.float32)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt) * (2 if _is_rate_limit(e) else 1)
+            logging.warning(f"Lot de {len(texts)} embedding(s) en échec ({repr(e)}), "
+                            f"nouvelle tentative dans {delay:.1f}s")
+            time.sleep(delay)
+
+
+def iter_embeddings(texts: Sequence[str], embed: Callable[[List[str]], List[List[float]]],
+                    limiter: Optional[RateLimiter] = None, retries: int = EMBEDDING_RETRIES,
+                    backoff: float = EMBEDDING_BACKOFF) -> Iterator[Tuple[List[int], np.ndarray]]:
+    """
+    Calcule les embeddings de `texts` avec `embed` (ex. embeddings.embed_documents) et
+    produit des couples (positions dans texts, vecteurs) à mesure que les lots se terminent.
+    """
+    if not texts:
+        return
+    limiter = limiter or _rate_limiter
+    token_counts = [count_tokens(text) for text in texts]
+    batches = make_batches(token_counts)
+    logging.info(f"{len(texts)} embedding(s) à calculer en {len(batches)} lot(s)")
+
+    executor = _get_executor()
+    futures = {
+        executor.submit(_embed_batch, embed, [texts[i] for i in batch], sum(token_counts[i] for i in batch),
+                        limiter, retries, backoff): batch
+        for batch in batches
+    }
+    try:
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield futures[future], future.result()
+    finally:
+        # Arrêt anticipé (erreur, générateur abandonné) : les lots pas encore partis sont annulés
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,229 @@
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+from schedule_store import get_schedule_view, iter_schedule_events
+
+logger = logging.getLogger(__name__)
+
+_NAT = np.datetime64("NaT", "m").astype(np.int64)
+
+
+def to_epoch_minutes(value: datetime) -> int:
+    """Convertit une date (heure locale naïve) en minutes depuis 1970-01-01."""
+    return int(np.datetime64(value, "m").astype(np.int64))
+
+
+def from_epoch_minutes(minutes: int) -> datetime:
+    """Inverse de to_epoch_minutes."""
+    return np.datetime64(int(minutes), "m").astype(datetime)
+
+
+def _parse_minutes(values: Sequence[str]) -> np.ndarray:
+    """Parse en une fois des dates 'YYYY-MM-DD HH:MM' / ISO vers des minutes epoch (NaT si invalide)."""
+    normalized = [(value or "").replace(" ", "T")[:16] for value in values]
+    try:
+        return np.array(normalized, dtype="datetime64[m]").astype(np.int64)
+    except ValueError:
+        # Au moins une date invalide : on retombe sur un parsing élément par élément
+        parsed = np.empty(len(normalized), dtype=np.int64)
+        for i, value in enumerate(normalized):
+            try:
+                parsed[i] = np.datetime64(value, "m").astype(np.int64) if value else _NAT
+            except ValueError:
+                parsed[i] = _NAT
+        return parsed
+
+
+def _intern(values: Iterable[str], vocabulary: List[str], codes: Dict[str, int]) -> np.ndarray:
+    """Remplace chaque chaîne par son code entier dans le vocabulaire (ajoute les nouvelles)."""
+    out = []
+    for value in values:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(vocabulary)
+            vocabulary.append(value)
+        out.append(code)
+    return np.array(out, dtype=np.int32)
+
+
+class EventTable:
+    """
+    Représentation en colonnes (NumPy) d'une liste d'événements du scraper.
+
+    Les débuts/fins sont des int64 en minutes epoch (heure locale), les cours, professeurs
+    et salles sont des codes entiers vers les vocabulaires `courses`, `professors` et
+    `locations`. Les lignes sont triées par date de début ; `events` garde les dicts
+    d'origine dans le même ordre.
+    """
+
+    def __init__(self, start: np.ndarray, end: np.ndarray, course: np.ndarray, professor: np.ndarray,
+                 location: np.ndarray, added_by_ai: np.ndarray, courses: List[str], professors: List[str],
+                 locations: List[str], events: List[Dict[str, Any]]):
+        self.start = start
+        self.end = end
+        self.course = course
+        self.professor = professor
+        self.location = location
+        self.added_by_ai = added_by_ai
+        self.courses = courses
+        self.professors = professors
+        self.locations = locations
+        self.events = events
+
+    @classmethod
+    def from_events(cls, events: Iterable[Dict[str, Any]]) -> "EventTable":
+        """Construit la table depuis une liste d'événements (format get_edt_semaine)."""
+        events = list(events)
+        start = _parse_minutes([e.get("début") or e.get("start", "") for e in events])
+        end = _parse_minutes([e.get("fin") or e.get("end", "") for e in events])
+
+        valid = (start != _NAT) & (end != _NAT)
+        if not valid.all():
+            logger.warning(f"⚠️ {int((~valid).sum())} événement(s) sans dates valides ignoré(s)")
+
+        order = np.flatnonzero(valid)
+        order = order[np.argsort(start[order], kind="stable")]
+        events = [events[i] for i in order]
+
+        courses: List[str] = []
+        professors: List[str] = []
+        locations: List[str] = []
+        return cls(
+            start=start[order],
+            end=end[order],
+            course=_intern((e.get("nom_cours") or e.get("title", "Cours") for e in events), courses, {}),
+            professor=_intern((e.get("professeur", "") for e in events), professors, {}),
+            location=_intern((e.get("location", "") for e in events), locations, {}),
+            added_by_ai=np.array([bool(e.get("extendedProps", {}).get("added_by_ai")) for e in events], dtype=bool),
+            courses=courses,
+            professors=professors,
+            locations=locations,
+            events=events,
+        )
+
+    @classmethod
+    def from_schedule(cls, data: Any) -> "EventTable":
+        """Construit la table depuis le JSON d'un emploi du temps (cours + révisions IA)."""
+        events = list(iter_schedule_events(data))
+        if isinstance(data, dict):
+            events.extend(data.get("revisions", []))
+        return cls.from_events(events)
+
+    @classmethod
+    def concat(cls, tables: Sequence["EventTable"]) -> "EventTable":
+        """Fusionne plusieurs tables (ex: toute une promotion) avec des vocabulaires communs."""
+        if not tables:
+            return cls.from_events([])
+
+        courses: List[str] = []
+        professors: List[str] = []
+        locations: List[str] = []
+        course_codes: Dict[str, int] = {}
+        professor_codes: Dict[str, int] = {}
+        location_codes: Dict[str, int] = {}
+
+        # Recodage de chaque table vers les vocabulaires communs
+        course = np.concatenate([_intern(t.courses, courses, course_codes)[t.course] for t in tables])
+        professor = np.concatenate([_intern(t.professors, professors, professor_codes)[t.professor] for t in tables])
+        location = np.concatenate([_intern(t.locations, locations, location_codes)[t.location] for t in tables])
+
+        start = np.concatenate([t.start for t in tables])
+        order = np.argsort(start, kind="stable")
+        events = [event for t in tables for event in t.events]
+        return cls(
+            start=start[order],
+            end=np.concatenate([t.end for t in tables])[order],
+            course=course[order],
+            professor=professor[order],
+            location=location[order],
+            added_by_ai=np.concatenate([t.added_by_ai for t in tables])[order],
+            courses=courses,
+            professors=professors,
+            locations=locations,
+            events=[events[i] for i in order],
+        )
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    # === MASQUES ===
+
+    def between(self, start_dt: datetime, end_dt: datetime) -> np.ndarray:
+        """Masque des événements dont le début est dans [start_dt, end_dt]."""
+        return (self.start >= to_epoch_minutes(start_dt)) & (self.start <= to_epoch_minutes(end_dt))
+
+    def on_day(self, day: date) -> np.ndarray:
+        """Masque des événements qui commencent le jour donné."""
+        day_start = to_epoch_minutes(datetime.combine(day, time.min))
+        return (self.start >= day_start) & (self.start < day_start + 24 * 60)
+
+    def matching_subject(self, subject: str) -> np.ndarray:
+        """Masque des événements dont le cours ou le professeur contient `subject` (sans casse)."""
+        subject_lower = subject.lower()
+        course_codes = [i for i, name in enumerate(self.courses) if subject_lower in name.lower()]
+        professor_codes = [i for i, name in enumerate(self.professors) if subject_lower in name.lower()]
+        return np.isin(self.course, course_codes) | np.isin(self.professor, professor_codes)
+
+    # === ACCÈS / AGRÉGATS ===
+
+    def rows(self, mask: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Événements d'origine (dicts) sélectionnés par le masque, triés par début."""
+        indices = range(len(self)) if mask is None else np.flatnonzero(mask)
+        return [self.events[i] for i in indices]
+
+    def counts_by_course(self, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Nombre d'événements par intitulé de cours."""
+        codes = self.course if mask is None else self.course[mask]
+        counts = np.bincount(codes, minlength=len(self.courses))
+        return {self.courses[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+
+    def free_slots(self, day: date, day_start: time = time(8, 0), day_end: time = time(18, 0)) -> List[Dict[str, Any]]:
+        """
+        Créneaux libres d'une journée entre day_start et day_end.
+
+        Retourne une liste de {"start", "end", "before", "after"} où start/end sont des
+        datetime et before/after les intitulés des cours qui encadrent le créneau (ou None).
+        """
+        idx = np.flatnonzero(self.on_day(day))
+        if len(idx) == 0:
+            return [{
+                "start": datetime.combine(day, day_start),
+                "end": datetime.combine(day, day_end),
+                "before": None,
+                "after": None,
+            }]
+
+        starts = self.start[idx]
+        ends = self.end[idx]
+        titles = self.course[idx]
+        open_minute = to_epoch_minutes(datetime.combine(day, day_start))
+        close_minute = to_epoch_minutes(datetime.combine(day, day_end))
+
+        slots = []
+        if starts[0] > open_minute:
+            slots.append((open_minute, starts[0], None, titles[0]))
+
+        # Trous entre deux cours consécutifs, calculés en une seule opération vectorielle
+        gaps = np.flatnonzero(ends[:-1] < starts[1:])
+        slots.extend((ends[i], starts[i + 1], titles[i], titles[i + 1]) for i in gaps)
+
+        if ends[-1] < close_minute:
+            slots.append((ends[-1], close_minute, titles[-1], None))
+
+        return [
+            {
+                "start": from_epoch_minutes(slot_start),
+                "end": from_epoch_minutes(slot_end),
+                "before": self.courses[before] if before is not None else None,
+                "after": self.courses[after] if after is not None else None,
+            }
+            for slot_start, slot_end, before, after in slots
+        ]
+
+
+def get_event_table(user_id: str) -> Optional[EventTable]:
+    """EventTable de l'utilisateur, construite une seule fois par version du fichier (None si absent)."""
+    return get_schedule_view(user_id, "table", EventTable.from_schedule)
@@ -1,59 +1,99 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 import faiss
-from langchain_community.docstore.in_memory import InMemoryDocstore
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
+import numpy as np
 from langchain_core.documents import Document
-from langchain_community.document_loaders import JSONLoader
 import logging
 import os
+import threading
+
+from embedding_backends import (DEFAULT_DIMENSIONS, OPENAI_EMBEDDING_MODEL, OPENAI_FULL_DIMENSIONS,
+                                REMOTE_BACKENDS, create_embeddings)
+from embedding_cache import content_hash, get_embedding_cache
+from embedding_pipeline import EMBEDDING_CONCURRENCY, iter_embeddings
+import faiss_storage
+import hashlib
 
 
 ###################PATH VARIABLES###################
 DATA_PATH = "data/"
 FAISS_PATH = "faiss_data"
 JSON_PATH ="json_schedules"
-##################SETUP DES LOGS###################
-# Ensure the logs directory exists
-log_dir = "logs"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)  # Create the directory if it doesn't exist
-
-script_name = os.path.splitext(os.path.basename(__file__))[0]
-log_file = os.path.join(log_dir, f"{script_name}.warn.log")
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),  # Écrire dans le fichier log
-        logging.StreamHandler()  # Écrire dans la console (terminal)
-    ]
-)
-##############################################
-
-# Chargement des variables d'environnement
-try:
-    load_dotenv()
-    logging.info("Variables d'environnement chargées")
-except Exception as e:
-    logging.error(f"Erreur dans le chargement des variables d'environnement: {repr(e)}")
-
-# Configuration de l'API Key
-try:
-    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_KEY")
-    if not os.environ["OPENAI_API_KEY"]:
-        raise ValueError("OPENAI_API_KEY non défini dans les variables d'environnement.")
-except Exception as e:
-    logging.error(f"Erreur lors de la définition de la clé API OpenAI: {repr(e)}")
-
-# Initialisation des embeddings
-try:
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-    logging.info("Modèle initialisé")
-except Exception as e:
-    logging.error(f"Erreur dans l'initialisation du modèle: {repr(e)}")
+EMBEDDING_CACHE_PATH = os.path.join(FAISS_PATH, "embeddings_cache.sqlite")
+# Backend d'embeddings : "openai" (défaut) ou "local" (hachage de n-grammes, hors ligne)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+EMBEDDING_MODEL = OPENAI_EMBEDDING_MODEL
+EMBEDDING_FULL_DIMENSIONS = OPENAI_FULL_DIMENSIONS
+# Les modèles text-embedding-3 acceptent des vecteurs raccourcis (256, 512, 1024...) :
+# index plus petit et recherche plus rapide, pour une perte de qualité faible.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", str(DEFAULT_DIMENSIONS.get(EMBEDDING_BACKEND, EMBEDDING_FULL_DIMENSIONS))))
+# Les vecteurs en cache dépendent de la dimension demandée
+EMBEDDING_CACHE_MODEL = (EMBEDDING_MODEL if EMBEDDING_DIMENSIONS == EMBEDDING_FULL_DIMENSIONS
+                         else f"{EMBEDDING_MODEL}@{EMBEDDING_DIMENSIONS}")
+###################INDEX FAISS###################
+# Chaîne faiss.index_factory des nouveaux index : "Flat" (exact), "HNSW32", "IVF256,Flat",
+# "IVF256,PQ64", "SQ8", "HNSW32,SQ8"... Les index existants gardent leur type.
+FAISS_INDEX_FACTORY = os.getenv("FAISS_INDEX_FACTORY", "Flat")
+FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "20000"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+# Stockage des vecteurs dans l'index : "float32", "float16" (x2 plus petit) ou "int8" (x4)
+FAISS_VECTOR_STORAGE = os.getenv("FAISS_VECTOR_STORAGE", "float32")
+_STORAGE_CODECS = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+# Modèle d'embeddings, créé au premier usage (voir get_embeddings)
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def _load_environment():
+    """Charge le .env et la clé API ; appelé une seule fois, à la création du modèle."""
+    try:
+        load_dotenv()
+        logging.info("Variables d'environnement chargées")
+    except Exception as e:
+        logging.error(f"Erreur dans le chargement des variables d'environnement: {repr(e)}")
+
+    if EMBEDDING_BACKEND not in REMOTE_BACKENDS:
+        return
+    # Configuration de l'API Key
+    try:
+        os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_KEY")
+        if not os.environ["OPENAI_API_KEY"]:
+            raise ValueError("OPENAI_API_KEY non défini dans les variables d'environnement.")
+    except Exception as e:
+        logging.error(f"Erreur lors de la définition de la clé API OpenAI: {repr(e)}")
+
+
+def get_embeddings():
+    """
+    Modèle d'embeddings partagé par le processus.
+
+    Il est créé au premier appel et non à l'import : importer ce module (app, jobs CLI)
+    ne charge ni le client OpenAI ni le .env tant qu'aucun embedding n'est demandé.
+    """
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            _load_environment()
+            try:
+                _embeddings = create_embeddings(EMBEDDING_BACKEND, EMBEDDING_DIMENSIONS)
+                logging.info(f"Modèle initialisé (backend {EMBEDDING_BACKEND})")
+            except Exception as e:
+                logging.error(f"Erreur dans l'initialisation du modèle: {repr(e)}")
+                raise
+        return _embeddings
+
+
+def event_document_id(user_id, start, course, end=None, location=None):
+    """
+    Identifiant stable d'un cours : le même événement garde le même id d'un rafraîchissement à l'autre.
+    La fin et la salle en font partie : deux séances simultanées d'un même cours (groupes,
+    salles différentes) restent deux documents distincts.
+    """
+    key = f"{user_id}|{start}|{end or ''}|{course}|{location or ''}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
 
 # Permet à la fonction metadata_func d'avoir acces à la variable user_id
 def create_metadata_func(user_id):
@@ -65,11 +105,15 @@ def create_metadata_func(user_id):
             start_date = datetime.strptime(start_date_str, "%Y-%m-%d %H:%M")
             metadata['date'] = start_date.date().isoformat()  # Store the date in ISO format
         metadata['user_id'] = user_id
+        metadata['event_id'] = event_document_id(user_id, start_date_str, record.get('nom_cours'),
+                                                 record.get('fin'), record.get('location'))
         metadata['source'] = f"http://applis.univ-nc.nc/cgi-bin/WebObjects/EdtWeb.woa/2/wa/default?login={user_id}%2Fical"
         return metadata
     return metadata_func
 
 def json_to_documents(user_id):
+    from langchain_community.document_loaders import JSONLoader
+
     logging.info("Création du JSONLoader")
     loader = JSONLoader(
         file_path=f'{JSON_PATH}/{user_id}_edt.json',
@@ -83,71 +127,430 @@ def json_to_documents(user_id):
 
     return documents
 
-def load_faiss_vector_store():
+class ReadWriteLock:
+    """Verrou lecteurs/rédacteur : plusieurs recherches en parallèle, écritures exclusives."""
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+
+    def acquire_read(self):
+        with self._condition:
+            while self._writer:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        with self._condition:
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._writer = True
+
+    def release_write(self):
+        with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+
+def index_root():
+    """Répertoire des index : un par backend, des vecteurs de backends différents n'étant pas comparables."""
+    return FAISS_PATH if EMBEDDING_BACKEND == "openai" else f"{FAISS_PATH}_{EMBEDDING_BACKEND}"
+
+
+class _UserPartition:
+    """Index FAISS d'un utilisateur, gardé en mémoire et rechargé seulement s'il change sur disque."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.path = os.path.join(index_root(), user_id.replace(os.sep, "_"))
+        self.lock = ReadWriteLock()
+        self.vector_store = None
+        self.version = None
+        # date ISO -> positions FAISS des documents de ce jour
+        self.date_ids = {}
+        # id du document -> hash de son contenu (pour savoir ce qui a changé)
+        self.doc_hashes = {}
+
+    def disk_version(self):
+        """Empreinte de l'état sur disque (snapshot + journal), None s'il n'existe pas."""
+        return faiss_storage.storage_version(self.path)
+
+    def is_current(self):
+        return self.vector_store is not None and self.disk_version() == self.version
+
+    def refresh(self):
+        """Recharge l'index si les fichiers ont changé. À appeler sous verrou d'écriture."""
+        version = self.disk_version()
+        if self.vector_store is not None and version == self.version:
+            return
+        self.vector_store = load_faiss_vector_store(self.path) if version else None
+        self.version = version
+        self.rebuild_date_ids()
+
+    def rebuild_date_ids(self):
+        """Reconstruit la table date -> positions et les hash des documents indexés."""
+        buckets = defaultdict(list)
+        self.doc_hashes = {}
+        if self.vector_store is not None:
+            for position, doc_id in self.vector_store.index_to_docstore_id.items():
+                doc = self.vector_store.docstore.search(doc_id)
+                if isinstance(doc, Document):
+                    buckets[doc.metadata.get("date")].append(position)
+                    self.doc_hashes[doc_id] = doc.metadata.get("content_hash") or content_hash(doc.page_content)
+        self.date_ids = {date: np.array(ids, dtype="int64") for date, ids in buckets.items()}
+
+
+# Une partition par utilisateur, partagée par tout le processus
+_partitions = {}
+_partitions_lock = threading.Lock()
+
+
+def index_factory_string(factory=None, storage=None):
+    """
+    Chaîne index_factory avec l'encodage de stockage demandé :
+    "Flat" -> "SQfp16", "IVF256,Flat" -> "IVF256,SQ8", "HNSW32" -> "HNSW32,SQfp16"...
+    Les index déjà compressés (PQ, SQ) sont laissés tels quels.
+    """
+    factory = factory or FAISS_INDEX_FACTORY
+    storage = storage or FAISS_VECTOR_STORAGE
+    codec = _STORAGE_CODECS.get(storage)
+    if codec is None:
+        logging.warning(f"Stockage '{storage}' inconnu ({', '.join(_STORAGE_CODECS)}), float32 utilisé")
+        return factory
+    if codec == "Flat":
+        return factory
+    parts = factory.split(",")
+    if parts[-1] == "Flat":
+        parts[-1] = codec
+    elif len(parts) == 1 and parts[0].startswith("HNSW"):
+        parts.append(codec)
+    return ",".join(parts)
+
+
+def build_index(dim, training_vectors, factory=None):
+    """
+    Crée un index FAISS vide selon `factory` (par défaut FAISS_INDEX_FACTORY avec
+    l'encodage FAISS_VECTOR_STORAGE).
+
+    Les index qui en ont besoin (IVF, PQ, SQ) sont entraînés sur un échantillon de
+    `training_vectors`. Si l'entraînement est impossible (trop peu de vecteurs pour le
+    nombre de listes IVF, par exemple), on se rabat sur un index exact IndexFlatL2.
+    """
+    factory = factory or index_factory_string()
+    try:
+        index = faiss.index_factory(dim, factory)
+        if not index.is_trained:
+            sample = np.asarray(training_vectors, dtype=np.float32)
+            if len(sample) > FAISS_TRAIN_SAMPLE:
+                sample = sample[np.random.default_rng(0).choice(len(sample), FAISS_TRAIN_SAMPLE, replace=False)]
+            ivf = faiss.try_extract_index_ivf(index)
+            if ivf is not None and len(sample) < ivf.nlist:
+                raise ValueError(f"{len(sample)} vecteurs pour {ivf.nlist} listes IVF")
+            index.train(sample)
+        return index
+    except Exception as e:
+        logging.warning(f"Index '{factory}' impossible ({repr(e)}), utilisation d'un index exact Flat")
+        return faiss.IndexFlatL2(dim)
+
+
+def search_parameters(index, selector=None):
+    """Paramètres de recherche adaptés au type d'index (nprobe IVF, efSearch HNSW, filtre d'ids)."""
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=FAISS_NPROBE)
+    if isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=FAISS_EF_SEARCH)
+    return faiss.SearchParameters(sel=selector) if selector is not None else None
+
+
+def _get_partition(user_id):
+    with _partitions_lock:
+        partition = _partitions.get(user_id)
+        if partition is None:
+            partition = _partitions[user_id] = _UserPartition(user_id)
+        return partition
+
+
+def load_faiss_vector_store(path=FAISS_PATH):
     """
     Charge le vector store FAISS à partir du chemin spécifié.
     
     Returns:
         FAISS: L'instance du vector store FAISS chargée.
     """
-    if os.path.exists(FAISS_PATH):
+    if os.path.exists(path):
         try:
-            vector_store = FAISS.load_local(FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
-            logging.info(f"Index FAISS local chargé depuis : {FAISS_PATH}")
+            # Dernier snapshot + rejeu du journal des modifications
+            vector_store = faiss_storage.load_store(path, get_embeddings())
+            if vector_store is not None and vector_store.index.d != EMBEDDING_DIMENSIONS:
+                # Index construit avec une autre dimension : inutilisable avec les requêtes actuelles
+                logging.warning(f"Index {path} en dimension {vector_store.index.d} au lieu de "
+                                f"{EMBEDDING_DIMENSIONS} : il sera reconstruit à la prochaine ingestion")
+                return None
+            logging.info(f"Index FAISS local chargé depuis : {path}")
             return vector_store
         except Exception as e:
             logging.error(f"Erreur lors du chargement de l'index FAISS : {repr(e)}")
             return None
     else:
-        logging.info(f"Aucun index FAISS trouvé à {FAISS_PATH}")
+        logging.info(f"Aucun index FAISS trouvé à {path}")
         return None
 
+
+def get_vector_store(user_id):
+    """
+    Retourne le vector store FAISS de l'utilisateur (None s'il n'a pas encore d'index).
+
+    Chaque utilisateur a son propre index dans index_root()/<user_id>. Il n'est désérialisé
+    qu'au premier appel, puis seulement quand ses fichiers changent sur disque.
+    """
+    partition = _get_partition(user_id)
+    if partition.is_current():
+        return partition.vector_store
+    partition.lock.acquire_write()
+    try:
+        partition.refresh()
+        return partition.vector_store
+    finally:
+        partition.lock.release_write()
+
+
+def _matches(metadata, filter_criteria):
+    """Filtre de métadonnées façon langchain (valeur simple ou liste de valeurs acceptées)."""
+    for key, expected in filter_criteria.items():
+        value = metadata.get(key)
+        if isinstance(expected, list):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+def _search_partition(partition, querry_text, filter_criteria, top_k):
+    """Recherche dans l'index d'un utilisateur en ne visitant que les vecteurs des dates demandées."""
+    vector_store = partition.vector_store
+    filter_criteria = dict(filter_criteria or {})
+    # La partition ne contient que cet utilisateur : le filtre user_id est déjà appliqué
+    filter_criteria.pop("user_id", None)
+    dates = filter_criteria.pop("date", None)
+
+    selector = None
+    candidates = vector_store.index.ntotal
+    if dates is not None:
+        dates = dates if isinstance(dates, list) else [dates]
+        buckets = [partition.date_ids[date] for date in dates if date in partition.date_ids]
+        if not buckets:
+            return []
+        ids = np.concatenate(buckets)
+        candidates = len(ids)
+        # Pré-filtrage dans FAISS : seuls les vecteurs de ces dates sont comparés
+        selector = faiss.IDSelectorBatch(ids)
+
+    # Avec d'autres critères, on récupère tous les candidats puis on filtre les métadonnées
+    k = candidates if filter_criteria else min(top_k, candidates)
+    if k == 0:
+        return []
+    query = np.array([vector_store.embedding_function.embed_query(querry_text)], dtype=np.float32)
+    _, labels = vector_store.index.search(query, k, params=search_parameters(vector_store.index, selector))
+
+    results = []
+    for position in labels[0]:
+        if position == -1:
+            continue
+        doc = vector_store.docstore.search(vector_store.index_to_docstore_id[int(position)])
+        if isinstance(doc, Document) and _matches(doc.metadata, filter_criteria):
+            results.append(doc)
+            if len(results) == top_k:
+                break
+    return results
+
+
 def retrieve_documents(querry_text,filter_criteria, user_id, top_k=1):
-    vector_store = load_faiss_vector_store()  # Charger le vector store ici
-    if vector_store:
+    partition = _get_partition(user_id)
+    if get_vector_store(user_id):
+        partition.lock.acquire_read()
         try:
-            # On recherche dans le vector store FAISS
-            results = vector_store.similarity_search(
-                querry_text,fetch_k=1000000 ,k=top_k, filter=filter_criteria
-            )
+            # Une écriture en échec a pu vider la partition entre le rafraîchissement et ce verrou
+            if partition.vector_store is None:
+                logging.info(f"Index de {user_id} indisponible")
+                return None
+            # On recherche dans l'index FAISS de l'utilisateur uniquement
+            results = _search_partition(partition, querry_text, filter_criteria, top_k)
             if results is not None:
                 logging.info(f"{len(results)}informations intéressante trouvée pour {user_id}")
                 return results
             else:
                 logging.info("Aucune information intéressante trouvée")
         except Exception as e:
-            logging.info(f"Erreur lors de la recherche de données : {repr(e)}")
+            logging.error(f"Erreur lors de la recherche de données : {repr(e)}")
+        finally:
+            partition.lock.release_read()
     return None
 
-def save_to_faiss(documents: list[Document]):
+def save_to_faiss(documents: list[Document], remove_missing: bool = False):
     """
-    Sauvegarde un document à un vector store de FAISS.
+    Upsert de documents dans les vector stores FAISS de leurs utilisateurs.
+
+    Chaque document est identifié par metadata["event_id"] (ou le hash de son contenu) :
+    un document inchangé n'est ni ré-embeddé ni ré-ajouté, un document modifié est remplacé.
 
     Args:
         documents (list[Document]): une liste de documents au format Langchain
+            (metadata["user_id"] désigne la partition de destination)
+        remove_missing (bool): si True, `documents` est la liste complète de l'utilisateur :
+            les documents indexés qui n'y figurent plus sont supprimés
+
+    Raises:
+        Exception: l'erreur d'embedding ou de sauvegarde d'un utilisateur (RuntimeError
+            listant les utilisateurs en échec quand plusieurs sont mis à jour en parallèle)
     """
+    documents_by_user = defaultdict(list)
+    for document in documents:
+        documents_by_user[document.metadata.get("user_id", "_shared")].append(document)
+
+    if len(documents_by_user) <= 1:
+        for user_id, user_documents in documents_by_user.items():
+            _save_partition(_get_partition(user_id), user_documents, remove_missing)
+        return
+    # Plusieurs utilisateurs : leurs partitions sont mises à jour en parallèle,
+    # les requêtes d'embedding restant bornées par le pool et le limiteur partagés
+    with ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY) as executor:
+        futures = {
+            user_id: executor.submit(_save_partition, _get_partition(user_id), user_documents, remove_missing)
+            for user_id, user_documents in documents_by_user.items()
+        }
+    # Un échec n'interrompt pas les autres utilisateurs, mais n'est pas passé sous silence
+    failed = []
+    for user_id, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            logging.error(f"Erreur lors de la mise à jour de l'index de {user_id} : {repr(e)}")
+            failed.append(user_id)
+    if failed:
+        raise RuntimeError(f"Mise à jour FAISS en échec pour : {', '.join(failed)}")
+
+
+def _iter_embedded(documents):
+    """
+    Embeddings des documents par lots (positions, vecteurs), au fil de leur calcul :
+    via le cache disque quand il est disponible, par lots concurrents sous limite de débit sinon.
+    """
+    texts = [document.page_content for document in documents]
+    if EMBEDDING_BACKEND not in REMOTE_BACKENDS:
+        # Backend local : recalculer coûte moins cher que le cache ou le découpage en lots
+        yield list(range(len(texts))), np.asarray(get_embeddings().embed_documents(texts), dtype=np.float32)
+        return
+    cache = get_embedding_cache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MODEL)
+    if cache is None:
+        yield from iter_embeddings(texts, get_embeddings().embed_documents)
+    else:
+        yield from cache.iter_embed_documents(texts, get_embeddings())
+
+
+def _add_record(ids, documents, vectors):
+    return (
+        "add", ids,
+        [document.page_content for document in documents],
+        [document.metadata for document in documents],
+        np.asarray(vectors, dtype=np.float32)
+    )
+
+
+def _save_partition(partition, documents, remove_missing=False):
+    partition.lock.acquire_write()
     try:
-        vector_store = load_faiss_vector_store()
-        # Création du vector store
-        if not vector_store:
-            logging.info("Création du vector store FAISS.")
-            # Si le fichier n'existe pas, on le crée
-            # On s'assure de toujours respecter les dimensions des vecteurs du modèle
-            index = faiss.IndexFlatL2(len(embeddings.embed_query("hello world")))
-            logging.info("Création du vector store FAISS.")
-            vector_store = FAISS(
-                embedding_function=embeddings,
-                index=index,
-                docstore=InMemoryDocstore(),
-                index_to_docstore_id={}
-            )
-    except Exception as e:
-        logging.error(f"Erreur lors de la création de l'index FAISS : {repr(e)}")
-    try:
-        vector_store.add_documents(documents=documents)
-        logging.info(f"Ajout de {len(documents)} documents dans {FAISS_PATH}")
-        vector_store.save_local(FAISS_PATH)
-        logging.info(f"Vectors store sauvegardé localement dans {FAISS_PATH} ")
-        
-    except Exception as e:
-        logging.error(f"Erreur lors de la sauvegarde des documents dans FAISS : {repr(e)}")
+        partition.refresh()
+
+        # Documents voulus, par identifiant stable (le dernier l'emporte en cas de doublon)
+        wanted = {}
+        for document in documents:
+            digest = content_hash(document.page_content)
+            document.metadata["content_hash"] = digest
+            wanted[document.metadata.get("event_id") or digest] = document
+
+        to_delete = [
+            doc_id for doc_id, digest in partition.doc_hashes.items()
+            if (doc_id in wanted and wanted[doc_id].metadata["content_hash"] != digest)
+            or (remove_missing and doc_id not in wanted)
+        ]
+        to_add = [
+            doc_id for doc_id, document in wanted.items()
+            if partition.doc_hashes.get(doc_id) != document.metadata["content_hash"]
+        ]
+
+        if not to_delete and not to_add:
+            logging.info(f"Index de {partition.user_id} déjà à jour ({len(wanted)} documents)")
+            return
+
+        try:
+            new_documents = [wanted[doc_id] for doc_id in to_add]
+            vector_store = partition.vector_store
+            created = not vector_store
+            # Création du vector store
+            if created:
+                if not new_documents:
+                    return
+                # L'entraînement éventuel de l'index (IVF, PQ) a besoin de tous les vecteurs
+                vectors = np.zeros((len(new_documents), EMBEDDING_DIMENSIONS), dtype=np.float32)
+                for positions, batch in _iter_embedded(new_documents):
+                    vectors[positions] = batch
+                logging.info(f"Création du vector store FAISS pour {partition.user_id}.")
+                # La dimension vient de la configuration (pas d'appel réseau pour la déterminer)
+                index = build_index(EMBEDDING_DIMENSIONS, vectors)
+                from langchain_community.docstore.in_memory import InMemoryDocstore
+                from langchain_community.vectorstores import FAISS
+
+                vector_store = FAISS(
+                    embedding_function=get_embeddings(),
+                    index=index,
+                    docstore=InMemoryDocstore(),
+                    index_to_docstore_id={}
+                )
+        except Exception as e:
+            logging.error(f"Erreur lors de la création de l'index FAISS : {repr(e)}")
+            raise
+        try:
+            records = []
+            if to_delete:
+                records.append(("delete", to_delete))
+            if created:
+                records.append(_add_record(to_add, new_documents, vectors))
+            for record in records:
+                faiss_storage.apply_record(vector_store, record)
+            if not created and new_documents:
+                # Les lots sont ajoutés à l'index dès qu'ils arrivent
+                for positions, batch in _iter_embedded(new_documents):
+                    record = _add_record([to_add[i] for i in positions], [new_documents[i] for i in positions], batch)
+                    faiss_storage.apply_record(vector_store, record)
+                    records.append(record)
+            logging.info(f"{partition.user_id} : {len(to_add)} document(s) ajouté(s)/modifié(s), "
+                         f"{len(to_delete)} supprimé(s), {len(wanted) - len(to_add)} inchangé(s)")
+
+            if created:
+                # Nouvel index : snapshot complet (remplace un éventuel index inutilisable)
+                faiss_storage.write_snapshot(partition.path, vector_store)
+            else:
+                # Seules les modifications sont écrites (journal), sauf compaction
+                faiss_storage.save_changes(partition.path, vector_store, records)
+            logging.info(f"Vectors store sauvegardé localement dans {partition.path} ")
+            # Le store en mémoire est déjà à jour : pas de rechargement depuis le disque
+            partition.vector_store = vector_store
+            partition.version = partition.disk_version()
+            partition.rebuild_date_ids()
+            
+        except Exception as e:
+            logging.error(f"Erreur lors de la sauvegarde des documents dans FAISS : {repr(e)}")
+            # État incertain : on forcera un rechargement depuis le disque
+            partition.vector_store = None
+            partition.version = None
+            raise
+    finally:
+        partition.lock.release_write()
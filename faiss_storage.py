@@ -0,0 +1,212 @@
+"""
+Persistance incrémentale d'un vector store FAISS (langchain).
+
+Disposition d'un répertoire de partition :
+
+    CURRENT                  nom du snapshot courant (remplacé atomiquement)
+    snapshot-000003/         index.faiss + index.pkl (format FAISS.save_local)
+    snapshot-000003.log      journal des modifications depuis ce snapshot
+
+Une sauvegarde n'écrit que ses modifications à la fin du journal (coût proportionnel
+au changement). Quand le journal devient gros par rapport au snapshot, il est compacté
+dans un nouveau snapshot, puis CURRENT est basculé d'un seul os.replace.
+"""
+import logging
+import os
+import pickle
+import shutil
+import struct
+from typing import Any, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+CURRENT_FILE = "CURRENT"
+# Compaction quand le journal dépasse ce ratio de la taille du snapshot (et au moins COMPACT_MIN_BYTES)
+COMPACT_RATIO = float(os.getenv("FAISS_COMPACT_RATIO", "0.5"))
+COMPACT_MIN_BYTES = int(os.getenv("FAISS_COMPACT_MIN_BYTES", str(1024 * 1024)))
+
+_HEADER = struct.Struct("<Q")
+
+
+def _read_current(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _stat(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def storage_version(path: str):
+    """Empreinte de l'état sur disque (CURRENT + journal), None si rien n'a été sauvegardé."""
+    snapshot = _read_current(path)
+    if snapshot is None:
+        # Ancien format : index.faiss / index.pkl directement dans le répertoire
+        legacy = (_stat(os.path.join(path, "index.faiss")), _stat(os.path.join(path, "index.pkl")))
+        return ("legacy",) + legacy if all(legacy) else None
+    return (snapshot, _stat(os.path.join(path, CURRENT_FILE)), _stat(os.path.join(path, f"{snapshot}.log")))
+
+
+def _iter_log(log_path: str):
+    """Enregistrements du journal ; un dernier enregistrement tronqué (crash en cours d'écriture) est ignoré."""
+    try:
+        f = open(log_path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            (length,) = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                logging.warning(f"Fin de journal tronquée ignorée dans {log_path}")
+                return
+            yield pickle.loads(payload)
+
+
+def _delete_by_rebuild(vector_store, ids) -> None:
+    """
+    Suppression pour les index qui ne savent pas retirer des vecteurs en renumérotant
+    les positions (HNSW, IVF) : on reconstruit l'index avec les vecteurs restants.
+    """
+    index = vector_store.index
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    vectors = index.reconstruct_n(0, index.ntotal)
+
+    to_delete = set(ids)
+    kept = [(position, doc_id) for position, doc_id in sorted(vector_store.index_to_docstore_id.items())
+            if doc_id not in to_delete]
+
+    rebuilt = faiss.clone_index(index)  # garde l'entraînement (centroïdes IVF, quantifieurs)
+    rebuilt.reset()
+    if kept:
+        rebuilt.add(np.ascontiguousarray(vectors[[position for position, _ in kept]]))
+    vector_store.index = rebuilt
+    vector_store.index_to_docstore_id = {i: doc_id for i, (_, doc_id) in enumerate(kept)}
+    vector_store.docstore.delete(list(to_delete))
+
+
+def apply_record(vector_store, record) -> None:
+    """Applique un enregistrement ('add' ou 'delete') au vector store en mémoire."""
+    if record[0] == "delete":
+        present = set(vector_store.index_to_docstore_id.values())
+        ids = [doc_id for doc_id in record[1] if doc_id in present]
+        if not ids:
+            return
+        if isinstance(faiss.downcast_index(vector_store.index), faiss.IndexFlatCodes):
+            vector_store.delete(ids)
+        else:
+            _delete_by_rebuild(vector_store, ids)
+    elif record[0] == "add":
+        _, ids, texts, metadatas, vectors = record
+        vector_store.add_embeddings(text_embeddings=list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+
+def load_store(path: str, embeddings):
+    """Charge le dernier snapshot puis rejoue son journal. None si rien n'a été sauvegardé."""
+    from langchain_community.vectorstores import FAISS
+
+    snapshot = _read_current(path)
+    if snapshot is None:
+        if storage_version(path) is None:
+            return None
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+    vector_store = FAISS.load_local(os.path.join(path, snapshot), embeddings, allow_dangerous_deserialization=True)
+    replayed = 0
+    for record in _iter_log(os.path.join(path, f"{snapshot}.log")):
+        apply_record(vector_store, record)
+        replayed += 1
+    if replayed:
+        logging.info(f"{replayed} modification(s) rejouée(s) depuis le journal de {path}")
+    return vector_store
+
+
+def append(path: str, records: Sequence[Any]) -> None:
+    """Ajoute des enregistrements à la fin du journal du snapshot courant (écriture + fsync)."""
+    snapshot = _read_current(path)
+    if snapshot is None:
+        raise FileNotFoundError(f"Aucun snapshot dans {path}")
+    with open(os.path.join(path, f"{snapshot}.log"), "ab") as f:
+        for record in records:
+            payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(_HEADER.pack(len(payload)) + payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def needs_compaction(path: str) -> bool:
+    snapshot = _read_current(path)
+    if snapshot is None:
+        return True
+    log_stat = _stat(os.path.join(path, f"{snapshot}.log"))
+    log_size = log_stat[1] if log_stat else 0
+    return log_size > max(COMPACT_MIN_BYTES, COMPACT_RATIO * _dir_size(os.path.join(path, snapshot)))
+
+
+def write_snapshot(path: str, vector_store) -> None:
+    """Écrit un nouveau snapshot complet, bascule CURRENT atomiquement et supprime l'ancien état."""
+    os.makedirs(path, exist_ok=True)
+    previous = _read_current(path)
+    number = int(previous.split("-")[1]) + 1 if previous else 1
+    snapshot = f"snapshot-{number:06d}"
+
+    tmp_dir = os.path.join(path, f"{snapshot}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    vector_store.save_local(tmp_dir)
+    # Reste éventuel d'une compaction interrompue avant la bascule de CURRENT
+    shutil.rmtree(os.path.join(path, snapshot), ignore_errors=True)
+    os.replace(tmp_dir, os.path.join(path, snapshot))
+    _remove(os.path.join(path, f"{snapshot}.log"))
+
+    tmp_current = os.path.join(path, f"{CURRENT_FILE}.tmp")
+    with open(tmp_current, "w", encoding="utf-8") as f:
+        f.write(snapshot)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_current, os.path.join(path, CURRENT_FILE))
+
+    # Nettoyage de l'état précédent (et de l'ancien format)
+    if previous:
+        shutil.rmtree(os.path.join(path, previous), ignore_errors=True)
+        _remove(os.path.join(path, f"{previous}.log"))
+    else:
+        _remove(os.path.join(path, "index.faiss"))
+        _remove(os.path.join(path, "index.pkl"))
+    logging.info(f"Snapshot {snapshot} écrit dans {path}")
+
+
+def _remove(file_path: str) -> None:
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def save_changes(path: str, vector_store, records: List[Any]) -> None:
+    """
+    Persiste des modifications déjà appliquées au vector store en mémoire :
+    ajout au journal, ou nouveau snapshot si le journal est devenu trop gros.
+    """
+    if _read_current(path) is None or needs_compaction(path):
+        write_snapshot(path, vector_store)
+        return
+    append(path, records)
+    if needs_compaction(path):
+        write_snapshot(path, vector_store)
@@ -0,0 +1,166 @@
+import codecs
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, Optional
+import logging
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# Seules propriétés VEVENT utilisées par le scraper
+_WANTED = {"SUMMARY", "DESCRIPTION", "LOCATION", "DTSTART", "DTEND"}
+_UNESCAPE = {"n": "\n", "N": "\n", ",": ",", ";": ";", "\\": "\\"}
+
+
+def iter_ics_lines(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Découpe un flux ICS (morceaux de bytes) en lignes logiques, au fil de l'eau.
+
+    Les lignes repliées (RFC 5545 : continuation commençant par un espace ou une tabulation)
+    sont recollées ; le flux n'est jamais matérialisé en entier.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    current: Optional[str] = None
+
+    def push(line: str):
+        nonlocal current
+        line = line.rstrip("\r")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            return None
+        previous, current = current, line
+        return previous
+
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            complete = push(line)
+            if complete:
+                yield complete
+
+    pending += decoder.decode(b"", final=True)
+    for line in pending.split("\n"):
+        complete = push(line)
+        if complete:
+            yield complete
+    if current:
+        yield current
+
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    out = []
+    chars = iter(value)
+    for char in chars:
+        if char == "\\":
+            following = next(chars, "")
+            out.append(_UNESCAPE.get(following, following))
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def _split_property(line: str):
+    """'NOM;PARAM=X:valeur' -> ('NOM', {'PARAM': 'X'}, 'valeur') (les ':' entre guillemets sont ignorés)."""
+    in_quotes = False
+    for i, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return None, {}, ""
+
+    name, *raw_params = head.split(";")
+    params = {}
+    for raw in raw_params:
+        key, _, param_value = raw.partition("=")
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def _parse_ics_datetime(value: str, params: Dict[str, str], local_tz) -> datetime:
+    """DTSTART/DTEND -> datetime dans le fuseau local_tz."""
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        # Journée entière : minuit heure locale
+        return local_tz.localize(datetime.strptime(value[:8], "%Y%m%d"))
+
+    if value.endswith("Z"):
+        moment = pytz.utc.localize(datetime.strptime(value[:-1], "%Y%m%dT%H%M%S"))
+    else:
+        naive = datetime.strptime(value, "%Y%m%dT%H%M%S")
+        tzid = params.get("TZID")
+        try:
+            tz = pytz.timezone(tzid) if tzid else pytz.utc
+        except pytz.UnknownTimeZoneError:
+            logger.warning(f"⚠️ Fuseau inconnu {tzid}, UTC utilisé")
+            tz = pytz.utc
+        # Heure "flottante" (sans TZID) : interprétée en UTC, comme le faisait la librairie ics
+        moment = tz.localize(naive)
+    return moment.astimezone(local_tz)
+
+
+def iter_vevents(lines: Iterable[str], local_tz=None) -> Iterator[Dict[str, Any]]:
+    """
+    Parcourt les VEVENT d'un flux de lignes ICS et produit, pour chacun, un dict
+    {"summary", "description", "location", "begin", "end"} où begin/end sont des
+    datetime convertis dans local_tz (Pacific/Noumea par défaut).
+
+    Les autres propriétés et les sous-composants (VALARM...) sont ignorés sans être parsés.
+    Un événement invalide est journalisé et sauté.
+    """
+    local_tz = local_tz or pytz.timezone("Pacific/Noumea")
+    event: Optional[Dict[str, Any]] = None
+    nested = 0
+
+    for line in lines:
+        if line.startswith("BEGIN:"):
+            if line == "BEGIN:VEVENT":
+                event, nested = {}, 0
+            elif event is not None:
+                nested += 1
+            continue
+
+        if line.startswith("END:"):
+            if line == "END:VEVENT" and event is not None:
+                try:
+                    yield _build_event(event, local_tz)
+                except (KeyError, ValueError) as e:
+                    logger.warning(f"⚠️ VEVENT ignoré: {e!r}")
+                event = None
+            elif event is not None and nested:
+                nested -= 1
+            continue
+
+        if event is None or nested:
+            continue
+
+        # Filtre rapide sur le nom avant de découper la ligne
+        name = line.split(":", 1)[0].split(";", 1)[0].upper()
+        if name not in _WANTED:
+            continue
+        name, params, value = _split_property(line)
+        event[name] = (params, value)
+
+
+def _build_event(raw: Dict[str, Any], local_tz) -> Dict[str, Any]:
+    start_params, start_value = raw["DTSTART"]
+    begin = _parse_ics_datetime(start_value, start_params, local_tz)
+    if "DTEND" in raw:
+        end_params, end_value = raw["DTEND"]
+        end = _parse_ics_datetime(end_value, end_params, local_tz)
+    else:
+        end = begin + (timedelta(days=1) if len(start_value.strip()) == 8 else timedelta(0))
+
+    return {
+        "summary": _unescape(raw["SUMMARY"][1]) if "SUMMARY" in raw else None,
+        "description": _unescape(raw["DESCRIPTION"][1]) if "DESCRIPTION" in raw else None,
+        "location": _unescape(raw["LOCATION"][1]) if "LOCATION" in raw else None,
+        "begin": begin,
+        "end": end,
+    }
@@ -0,0 +1,146 @@
+"""
+Routeur d'intentions local : répond sans appel au modèle aux questions simples et
+sans ambiguïté ("mes cours demain", "mon prochain cours", "suis-je libre jeudi ?").
+
+La question est découpée en mots normalisés ; une intention n'est retenue que si,
+une fois l'expression de date retirée, il ne reste que des mots connus de cette
+intention. Tout le reste (matière précise, demande d'ajout de révisions, question
+ouverte...) est laissé au modèle : route() renvoie alors None.
+"""
+from datetime import date, datetime
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from date_expressions import TimeExpression, format_day, tokenize
+from schedule_store import clean_course_title, parse_event_datetime
+
+logger = logging.getLogger(__name__)
+
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER", "1") != "0"
+
+# Mots sans incidence sur l'intention
+_FILLER = set("""
+a ai ai-je as avoir bonjour c ce cette d de des donne du en est est-ce et hello il j je l la le les
+liste me mes moi mon montre montre-moi peux peux-tu prevu prevus programme qu quand que quel quelle
+quelles quels qui quoi s salut sont stp suis suis-je svp t ta te tes ton tu un une vais y affiche
+dis dis-moi merci planning emploi temps edt ou
+""".split())
+_COURSE_WORDS = {"cours", "seance", "seances", "classe", "classes", "prochains"}
+_NEXT_WORDS = {"prochain", "cours", "suivant", "quelle", "heure", "commence", "debute", "ou"}
+_FREE_WORDS = {"libre", "libres", "dispo", "disponible", "disponibles", "creneau", "creneaux",
+               "temps", "trou", "trous", "pause", "pauses"}
+
+
+def route(prompt: str, now: Optional[datetime] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Intention et arguments d'une question simple, None si elle doit aller au modèle.
+
+        ("next_course", {})
+        ("courses", {"start": date, "end": date, "label": "demain", "from_time": None})
+        ("free_slots", {"day": date, "label": "jeudi 13/02"})
+
+    "ce soir" donne les cours du jour à partir de date_expressions.EVENING_START ; les créneaux libres
+    (calculés entre 8h et 18h) ne sont pas routés pour la soirée.
+    """
+    now = now or datetime.now()
+    tokens = tokenize(prompt, now.date())
+    if not tokens or len(tokens) > 15:
+        return None
+    expressions = [token for token in tokens if isinstance(token, TimeExpression)]
+    words = {token for token in tokens if isinstance(token, str) and token not in _FILLER}
+
+    if not expressions and "prochain" in words and words <= _NEXT_WORDS:
+        return "next_course", {}
+    if len(expressions) != 1:
+        return None
+    expression = expressions[0]
+    if (words & _FREE_WORDS and words <= _FREE_WORDS and expression.start == expression.end
+            and not expression.from_time):
+        return "free_slots", {"day": expression.start, "label": expression.label}
+    if words & _COURSE_WORDS and words <= _COURSE_WORDS:
+        return "courses", {"start": expression.start, "end": expression.end, "label": expression.label,
+                           "from_time": expression.from_time}
+    return None
+
+
+def _hour(value: str) -> str:
+    """'2025-02-10 13:30' ou '2025-02-10T13:30:00' -> '13:30'."""
+    return value.replace("T", " ")[11:16] if value else ""
+
+
+def _when(label: str, start: date, end: date) -> str:
+    """'demain (jeudi 13/02)', ou 'jeudi 13/02' quand le libellé est déjà la date."""
+    period = format_day(start) if start == end else f"{format_day(start)} → {format_day(end)}"
+    return label if label == period else f"{label} ({period})"
+
+
+def _render_courses(result: Dict[str, Any], start: date, end: date, label: str) -> str:
+    courses = result.get("courses", [])
+    if not courses:
+        return f"🎉 Aucun cours {_when(label, start, end)}."
+    lines = [f"📅 Tes cours {label} ({len(courses)}) :"]
+    current_day = None
+    for course in courses:
+        day = datetime.fromisoformat(course["start"]).date()
+        if start != end and day != current_day:
+            current_day = day
+            lines.append(f"\n**{format_day(day).capitalize()}**")
+        lines.append(f"- **{_hour(course['start'])}–{_hour(course['end'])}** : {clean_course_title(course['title'])}")
+    return "\n".join(lines)
+
+
+def _render_next_course(result: Dict[str, Any]) -> str:
+    course = result.get("next_course")
+    if not course:
+        return "📅 Aucun cours à venir dans ton emploi du temps."
+    start = course["start_datetime"]
+    when = "aujourd'hui" if course.get("is_today") else "demain" if course.get("is_tomorrow") else format_day(start.date())
+    lines = [f"⏭️ Ton prochain cours : **{clean_course_title(course['title'])}**, {when} à {start:%H:%M} "
+             f"(dans {course['time_until']})."]
+    if course.get("following_courses"):
+        lines.append("\nEnsuite :")
+        for following in course["following_courses"]:
+            following_start = parse_event_datetime(following["start"])
+            lines.append(f"- {format_day(following_start.date())} à {following_start:%H:%M} : "
+                         f"{clean_course_title(following['title'])}")
+    return "\n".join(lines)
+
+
+def _render_free_slots(slots: List[Dict[str, str]], day: date, label: str) -> str:
+    if not slots:
+        return f"😅 Aucun créneau libre {_when(label, day, day)} entre 8h et 18h."
+    lines = [f"🕒 Tes créneaux libres {_when(label, day, day)} :"]
+    for slot in slots:
+        lines.append(f"- **{slot['start']}–{slot['end']}** : {clean_course_title(slot['description'])}")
+    return "\n".join(lines)
+
+
+def answer(user_id: str, prompt: str, now: Optional[datetime] = None) -> Optional[str]:
+    """Réponse locale à une question simple, None pour laisser le modèle répondre."""
+    if not INTENT_ROUTER_ENABLED:
+        return None
+    routed = route(prompt, now)
+    if routed is None:
+        return None
+    from schedule_functions import get_courses_by_date_range, get_free_time_slots, get_next_course
+
+    intent, args = routed
+    logger.info(f"⚡ Intention locale: {intent} {args}")
+    try:
+        if intent == "next_course":
+            result = get_next_course(user_id)
+            if result.get("status") == "error":
+                return None
+            return _render_next_course(result)
+        if intent == "courses":
+            result = get_courses_by_date_range(user_id, f"{args['start'].isoformat()}T{args['from_time'] or '00:00'}:00",
+                                               f"{args['end'].isoformat()}T23:59:59")
+            if result.get("status") != "success":
+                return None
+            return _render_courses(result, args["start"], args["end"], args["label"])
+        if intent == "free_slots":
+            return _render_free_slots(get_free_time_slots(user_id, args["day"].isoformat()), args["day"], args["label"])
+    except Exception as e:
+        logger.error(f"❌ Routeur local en échec, passage au modèle: {e}")
+    return None
@@ -0,0 +1,25 @@
+import logging
+import os
+
+LOG_DIR = "logs"
+
+
+def setup_logging(script_name: str, level: int = logging.INFO) -> None:
+    """
+    Logs dans la console et dans logs/<script_name>.warn.log.
+
+    À appeler depuis les points d'entrée (scripts, jobs) et non à l'import des modules :
+    importer faiss_handler ou tools ne crée plus de fichier ni de handler.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(LOG_DIR, f"{script_name}.warn.log")),  # Écrire dans le fichier log
+            logging.StreamHandler()  # Écrire dans la console (terminal)
+        ]
+    )
@@ -0,0 +1,224 @@
+"""
+Cache des réponses de l'assistant aux questions fréquentes ("mes cours demain",
+"mon prochain cours"...).
+
+Une réponse est retrouvée pour un utilisateur si la question, une fois normalisée
+(minuscules, sans accents ni ponctuation, expressions de date remplacées par leur
+forme canonique : "2025-02-11" pour un jour, "2025-02-10..2025-02-16" pour une semaine),
+est identique, ou quasi identique au sens des embeddings du projet (faiss_handler)
+avec les mêmes arguments (dates, nombres) et les mêmes mots-clés. Seules les questions
+ancrées (date ou période explicite, prochain cours) sont concernées. Les réponses expirent après
+RESPONSE_CACHE_TTL secondes et sont invalidées dès que le fichier d'emploi du temps
+de l'utilisateur change (schedule_store.schedule_version) ou que le jour change.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+import numpy as np
+
+from date_expressions import TimeExpression, tokenize
+from schedule_store import schedule_version
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "900"))
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+# "Mon prochain cours" dépend de l'heure : durée de vie plus courte
+RESPONSE_CACHE_NEXT_TTL = float(os.getenv("RESPONSE_CACHE_NEXT_TTL", "300"))
+
+# Seules les questions portant clairement sur l'emploi du temps sont mises en cache
+# (mots entiers : "td" ne doit pas correspondre à l'intérieur d'un autre mot).
+INTENT_KEYWORDS = frozenset("""
+cours prochain prochains libre libres dispo disponible disponibles creneau creneaux emploi planning
+edt examen examens partiel partiels td tp cm revision revisions
+""".split())
+
+# Le prochain cours se comprend sans autre précision que ces deux mots
+_NEXT_COURSE = frozenset({"prochain", "cours"})
+
+_ARG_RE = re.compile(r"\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}|\.\.\d{4}-\d{2}-\d{2})?|\d+")
+
+
+def normalize_prompt(prompt: str, today: date) -> str:
+    """
+    Forme canonique d'une question : "Mes cours de DEMAIN ?" posée le 2025-02-10
+    donne "mes cours de 2025-02-11", "mes td cette semaine" donne
+    "mes td 2025-02-10..2025-02-16".
+    """
+    return " ".join(token.key if isinstance(token, TimeExpression) else token
+                    for token in tokenize(prompt, today))
+
+
+def _intent(normalized: str) -> FrozenSet[str]:
+    return INTENT_KEYWORDS.intersection(normalized.split())
+
+
+def is_cacheable_prompt(normalized: str) -> bool:
+    """
+    Question d'emploi du temps qui se suffit à elle-même : avec sa propre date ou période,
+    ou portant sur le prochain cours. Une relance comme "et les td ?" ou "et après les cours ?"
+    dépend des échanges précédents, pas seulement de son texte : elle n'est pas mise en cache.
+    """
+    intent = _intent(normalized)
+    if not intent:
+        return False
+    return _NEXT_COURSE <= intent or any("-" in argument for argument in _arguments(normalized))
+
+
+def _arguments(normalized: str) -> Tuple[str, ...]:
+    """Dates, périodes et nombres de la question : deux questions proches mais d'arguments différents ne se confondent pas."""
+    return tuple(_ARG_RE.findall(normalized))
+
+
+class ResponseCache:
+    """
+    Réponses récentes par utilisateur, valables pour une version de son emploi du temps
+    et un jour donnés (un changement du fichier vide les entrées de l'utilisateur).
+    Partagé par toutes les sessions du processus.
+
+    L'embedding d'une réponse stockée est calculé en arrière-plan, hors du chemin de la
+    réponse ; celui d'une question n'est calculé que s'il existe des candidats de mêmes
+    arguments et mots-clés, et réutilisé au stockage qui suit souvent un échec de recherche.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, threshold: float = RESPONSE_CACHE_THRESHOLD,
+                 max_entries: int = RESPONSE_CACHE_SIZE):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._users: Dict[str, dict] = {}
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, user_id: str, version, today: date) -> dict:
+        """Entrées de l'utilisateur, vidées si son fichier ou le jour a changé. Sous verrou."""
+        bucket = self._users.get(user_id)
+        if bucket is None or bucket["version"] != version or bucket["day"] != today:
+            bucket = self._users[user_id] = {"version": version, "day": today, "entries": OrderedDict()}
+        return bucket
+
+    def _expire(self, bucket: dict, now: float) -> None:
+        for key in [key for key, entry in bucket["entries"].items() if now > entry["expires"]]:
+            del bucket["entries"][key]
+
+    def _vector(self, normalized: str) -> Optional[np.ndarray]:
+        """Embedding de la question normalisée, mémorisé (appel au modèle hors verrou)."""
+        with self._lock:
+            vector = self._vectors.get(normalized)
+        if vector is not None:
+            return vector
+        vector = _embed(normalized)
+        if vector is not None:
+            with self._lock:
+                self._vectors[normalized] = vector
+                while len(self._vectors) > self.max_entries:
+                    self._vectors.popitem(last=False)
+        return vector
+
+    def _most_similar(self, candidates: list, normalized: str) -> Optional[dict]:
+        """Candidat le plus proche au sens des embeddings, s'il dépasse le seuil."""
+        vector = self._vector(normalized)
+        if vector is None:
+            return None
+        import faiss
+
+        index = faiss.IndexFlatIP(len(vector))
+        index.add(np.stack([entry["vector"] for entry in candidates]))
+        scores, positions = index.search(vector.reshape(1, -1), 1)
+        if positions[0][0] >= 0 and scores[0][0] >= self.threshold:
+            logger.info(f"♻️ Réponse en cache (similarité {scores[0][0]:.3f})")
+            return candidates[positions[0][0]]
+        return None
+
+    def lookup(self, user_id: str, prompt: str, today: Optional[date] = None) -> Optional[str]:
+        """Réponse encore valable pour cette question, ou None."""
+        today = today or date.today()
+        normalized = normalize_prompt(prompt, today)
+        if not is_cacheable_prompt(normalized):
+            return None
+        intent = _intent(normalized)
+        version = schedule_version(user_id)
+        arguments = _arguments(normalized)
+        with self._lock:
+            bucket = self._bucket(user_id, version, today)
+            self._expire(bucket, time.monotonic())
+            entry = bucket["entries"].get(normalized)
+            if entry is not None:
+                logger.info("♻️ Réponse en cache (question identique)")
+                return entry["response"]
+            # Seules des questions de mêmes arguments et mêmes mots-clés peuvent être équivalentes
+            candidates = [entry for entry in bucket["entries"].values()
+                          if entry["vector"] is not None and entry["arguments"] == arguments
+                          and entry["intent"] == intent]
+        if not candidates:
+            return None
+        # Embedding de la question hors verrou (appel réseau possible)
+        entry = self._most_similar(candidates, normalized)
+        return entry["response"] if entry else None
+
+    def store(self, user_id: str, prompt: str, response: str, today: Optional[date] = None) -> None:
+        today = today or date.today()
+        normalized = normalize_prompt(prompt, today)
+        if not response or not is_cacheable_prompt(normalized):
+            return
+        intent = _intent(normalized)
+        version = schedule_version(user_id)
+        arguments = _arguments(normalized)
+        ttl = min(self.ttl, RESPONSE_CACHE_NEXT_TTL) if "prochain" in intent and not arguments else self.ttl
+        with self._lock:
+            entry = {"response": response, "expires": time.monotonic() + ttl,
+                     "vector": self._vectors.get(normalized), "arguments": arguments, "intent": intent}
+            bucket = self._bucket(user_id, version, today)
+            bucket["entries"][normalized] = entry
+            bucket["entries"].move_to_end(normalized)
+            while len(bucket["entries"]) > self.max_entries:
+                bucket["entries"].popitem(last=False)
+        if entry["vector"] is None:
+            # La question reste retrouvable à l'identique tout de suite, par similarité ensuite
+            _get_embedder().submit(self._attach_vector, entry, normalized)
+
+    def _attach_vector(self, entry: dict, normalized: str) -> None:
+        vector = self._vector(normalized)
+        with self._lock:
+            entry["vector"] = vector
+
+
+_embedder: Optional[ThreadPoolExecutor] = None
+_embedder_lock = threading.Lock()
+
+
+def _get_embedder() -> ThreadPoolExecutor:
+    """Thread d'arrière-plan pour les embeddings des réponses stockées."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+        return _embedder
+
+
+def _embed(text: str) -> Optional[np.ndarray]:
+    """Embedding normalisé (norme 1) de la question, None si le modèle est indisponible."""
+    try:
+        from faiss_handler import get_embeddings
+
+        vector = np.asarray(get_embeddings().embed_query(text), dtype=np.float32)
+    except Exception as e:
+        logger.warning(f"⚠️ Embedding de la question impossible, cache exact uniquement: {e!r}")
+        return None
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+_response_cache = ResponseCache()
+
+
+def get_response_cache() -> ResponseCache:
+    return _response_cache
@@ -1,27 +1,80 @@
 import json
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from schedule_store import (get_schedule, get_schedule_index, get_schedule_view, parse_event_datetime, save_schedule,
+                            schedule_path, schedule_version)
+from event_table import get_event_table
 logger = logging.getLogger(__name__)
 
 def load_schedule_data(user_id: str) -> List[Dict]:
     """Charge les données du calendrier pour l'affichage Streamlit."""
+    view = get_calendar_view(user_id)
+    if view is None:
+        logger.error(f"❌ Fichier non trouvé: {schedule_path(user_id)}")
+        return []
+    return view["events"]
+
+
+def get_calendar_view(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Événements FullCalendar et statistiques de l'emploi du temps, construits une seule
+    fois par version du fichier (vue du cache de schedule_store) : un rerun Streamlit
+    ne relit ni ne retransforme rien tant que le fichier n'a pas changé.
+    Le résultat est partagé et ne doit pas être modifié. None si le fichier n'existe pas.
+    """
+    return get_schedule_view(user_id, "calendar", build_calendar_view)
+
+
+def build_calendar_view(data: Any) -> Dict[str, Any]:
+    """
+    Événements triés par début (avec débuts et fins parsés pour le fenêtrage par
+    dichotomie) et statistiques. Les événements aux dates illisibles sont dans "undated".
+    """
+    dated, undated = [], []
+    for event in build_calendar_events(data):
+        try:
+            dated.append((parse_event_datetime(event["start"]), parse_event_datetime(event["end"]), event))
+        except (TypeError, ValueError):
+            undated.append(event)
+    dated.sort(key=lambda item: item[0])
+    
+    events = [event for _, _, event in dated] + undated
+    ai_events = sum(1 for event in events if event.get("extendedProps", {}).get("added_by_ai"))
+    return {
+        "events": events,
+        "starts": [start for start, _, _ in dated],
+        "ends": [end for _, end, _ in dated],
+        # Plus longue durée : borne de recherche des événements commencés avant la fenêtre
+        "max_duration": max((end - start for start, end, _ in dated), default=timedelta(0)),
+        "undated": undated,
+        "stats": {"total": len(events), "courses": len(events) - ai_events, "ai": ai_events}
+    }
+
+
+def get_calendar_window(user_id: str, start: datetime, end: datetime) -> List[Dict]:
+    """Événements du calendrier qui chevauchent [start, end), par dichotomie dans la vue en cache."""
+    view = get_calendar_view(user_id)
+    if view is None:
+        return []
+    starts, ends = view["starts"], view["ends"]
+    first = bisect_left(starts, start - view["max_duration"])
+    last = bisect_left(starts, end)
+    window = [view["events"][position] for position in range(first, last) if ends[position] > start]
+    return window + view["undated"]
+
+
+def build_calendar_events(data: Any) -> List[Dict]:
+    """Convertit les données JSON de l'emploi du temps en événements FullCalendar."""
     try:
-        logger.info(f"📂 Chargement des données calendrier pour {user_id}")
-        
-        json_dir = "json_schedules"
-        json_file = os.path.join(json_dir, f"{user_id}_edt.json")
-        
-        if not os.path.exists(json_file):
-            logger.error(f"❌ Fichier non trouvé: {json_file}")
-            return []
-        
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        logger.info("📂 Construction des événements du calendrier")
         
         if not data:
-            logger.warning(f"⚠️ Fichier vide pour {user_id}")
+            logger.warning("⚠️ Fichier emploi du temps vide")
             return []
         
         calendar_events = []
@@ -155,7 +208,7 @@ def load_schedule_data(user_id: str) -> List[Dict]:
         return calendar_events
         
     except Exception as e:
-        logger.error(f"❌ Erreur load_schedule_data: {str(e)}")
+        logger.error(f"❌ Erreur build_calendar_events: {str(e)}")
         import traceback
         logger.error(f"📍 Traceback: {traceback.format_exc()}")
         return []
@@ -190,26 +243,11 @@ def get_courses_by_date_range(user_id: str, start_date: str, end_date: str) -> D
         logger.info(f"📅 Dates reçues: {start_date} → {end_date}")
         
         # === CHARGEMENT FICHIER ===
-        json_dir = "json_schedules"
-        json_file = os.path.join(json_dir, f"{user_id}_edt.json")
-        
-        if not os.path.exists(json_file):
+        index = get_schedule_index(user_id)
+        if index is None:
             return {'status': 'error', 'message': 'Fichier emploi du temps non trouvé'}
         
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # === EXTRACTION ÉVÉNEMENTS (Compatible avec ta structure) ===
-        all_events = []
-        if isinstance(data, dict) and "emploi_du_temps" in data:
-            logger.info(f"📊 Structure emploi_du_temps détectée")
-            for semaine_data in data["emploi_du_temps"]:
-                all_events.extend(semaine_data.get("evenements", []))
-        elif isinstance(data, list):
-            logger.info(f"📊 Structure liste détectée")
-            all_events = data
-        
-        logger.info(f"📊 {len(all_events)} événements extraits")
+        logger.info(f"📊 {len(index)} événements indexés")
         
         # === PARSING DATES DE RECHERCHE ===
         start_dt = datetime.fromisoformat(start_date)
@@ -222,50 +260,34 @@ def get_courses_by_date_range(user_id: str, start_date: str, end_date: str) -> D
         
         logger.info(f"📅 Période finale: {start_dt} → {end_dt}")
         
-        # === FILTRAGE AVEC GESTION DES DEUX FORMATS ===
+        # === RECHERCHE PAR DICHOTOMIE DANS L'INDEX TRIÉ ===
         filtered_courses = []
         
-        for event in all_events:
+        for course_start, event in index.between(start_dt, end_dt):
             try:
-                # 🎯 Gérer les deux formats de dates possibles
-                debut_field = event.get("début") or event.get("start", "")
-                if not debut_field:
-                    continue
-                
-                # Parse la date (compatible avec le format de ton scraper: 'YYYY-MM-DD HH:MM')
-                if "T" in debut_field:
-                    course_start = datetime.fromisoformat(debut_field.replace('T', ' ').split('+')[0])
-                else:
-                    course_start = datetime.strptime(debut_field, "%Y-%m-%d %H:%M")
-                
-                # Test de la période
-                is_in_range = start_dt <= course_start <= end_dt
-                logger.info(f"📅 {event.get('nom_cours', event.get('title', 'Cours'))}: {course_start} dans [{start_dt} - {end_dt}] = {is_in_range}")
+                # Récupérer le nom du cours selon le format
+                nom_cours = event.get('nom_cours') or event.get('title', 'Cours sans nom')
                 
-                if is_in_range:
-                    # Récupérer le nom du cours selon le format
-                    nom_cours = event.get('nom_cours') or event.get('title', 'Cours sans nom')
+                # Exclure les révisions et événements non-cours
+                if not (nom_cours.startswith('Révision') or 
+                        nom_cours.startswith('VACANCES') or 
+                        nom_cours.startswith('Férié')):
+                    
+                    # Gérer fin de cours
+                    fin_field = event.get('fin') or event.get('end', '')
+                    if fin_field and "T" in fin_field:
+                        fin_field = fin_field.replace('T', ' ').split('+')[0]
+                    
+                    filtered_courses.append({
+                        'title': nom_cours,
+                        'start': course_start.isoformat(),
+                        'end': fin_field,
+                        'professeur': event.get('professeur', ''),
+                        'location': event.get('location', ''),
+                        'description': event.get('description', '')
+                    })
+                    logger.info(f"✅ COURS AJOUTÉ: {nom_cours} à {course_start}")
                     
-                    # Exclure les révisions et événements non-cours
-                    if not (nom_cours.startswith('Révision') or 
-                            nom_cours.startswith('VACANCES') or 
-                            nom_cours.startswith('Férié')):
-                        
-                        # Gérer fin de cours
-                        fin_field = event.get('fin') or event.get('end', '')
-                        if fin_field and "T" in fin_field:
-                            fin_field = fin_field.replace('T', ' ').split('+')[0]
-                        
-                        filtered_courses.append({
-                            'title': nom_cours,
-                            'start': course_start.isoformat(),
-                            'end': fin_field,
-                            'professeur': event.get('professeur', ''),
-                            'location': event.get('location', ''),
-                            'description': event.get('description', '')
-                        })
-                        logger.info(f"✅ COURS AJOUTÉ: {nom_cours} à {course_start}")
-                        
             except Exception as e:
                 logger.error(f"❌ Erreur traitement événement: {e}")
                 continue
@@ -289,25 +311,21 @@ def get_courses_by_date_range(user_id: str, start_date: str, end_date: str) -> D
 def get_courses_by_subject(user_id: str, subject: str) -> Dict[str, Any]:
     """Récupère les cours d'une matière spécifique."""
     try:
-        schedule_data = load_schedule_data(user_id)
+        table = get_event_table(user_id)
         
-        if not schedule_data:
+        if not table:
             return {'status': 'success', 'courses': [], 'count': 0}
         
-        filtered_courses = []
-        subject_lower = subject.lower()
-        
-        for course in schedule_data:
-            # 🎯 CORRECTION : Gérer les deux formats
-            course_name = (course.get("title") or course.get("nom_cours", "")).lower()
-            
-            if subject_lower in course_name:
-                filtered_courses.append({
-                    'title': course.get('title') or course.get('nom_cours', 'Sans titre'),
-                    'start': course.get('start') or course.get('début', ''),
-                    'end': course.get('end') or course.get('fin', ''),
-                    'professeur': course.get('professeur', ''),
-                })
+        # Masque vectoriel sur les vocabulaires de cours/professeurs
+        filtered_courses = [
+            {
+                'title': course.get('nom_cours') or course.get('title', 'Sans titre'),
+                'start': course.get('début') or course.get('start', ''),
+                'end': course.get('fin') or course.get('end', ''),
+                'professeur': course.get('professeur', ''),
+            }
+            for course in table.rows(table.matching_subject(subject))
+        ]
         
         return {
             'status': 'success',
@@ -325,67 +343,27 @@ def get_free_time_slots(user_id: str, date: str) -> List[Dict[str, str]]:
     """
     Trouve les créneaux libres dans une journée donnée.
     """
-    schedule_data = load_schedule_data(user_id)
-    if not schedule_data:
+    table = get_event_table(user_id)
+    if not table:
         return []
     
-    # Filtrer les cours du jour demandé
     target_date = datetime.fromisoformat(date).date()
-    day_courses = []
-    
-    for course in schedule_data:
-        try:
-            course_date = datetime.strptime(course["début"], "%Y-%m-%d %H:%M").date()
-            if course_date == target_date:
-                day_courses.append({
-                    "start": datetime.strptime(course["début"], "%Y-%m-%d %H:%M").time(),
-                    "end": datetime.strptime(course["fin"], "%Y-%m-%d %H:%M").time(),
-                    "title": course["nom_cours"]
-                })
-        except (ValueError, KeyError):
-            continue
-    
-    # Trier par heure de début
-    day_courses.sort(key=lambda x: x["start"])
-    
-    # Trouver les créneaux libres
     free_slots = []
-    day_start = datetime.strptime("08:00", "%H:%M").time()
-    day_end = datetime.strptime("18:00", "%H:%M").time()
-    
-    if not day_courses:
-        return [{
-            "start": "08:00",
-            "end": "18:00", 
-            "description": "Toute la journée libre"
-        }]
-    
-    # Créneau libre avant le premier cours
-    if day_courses[0]["start"] > day_start:
-        free_slots.append({
-            "start": day_start.strftime("%H:%M"),
-            "end": day_courses[0]["start"].strftime("%H:%M"),
-            "description": f"Libre avant {day_courses[0]['title']}"
-        })
-    
-    # Créneaux libres entre les cours
-    for i in range(len(day_courses) - 1):
-        current_end = day_courses[i]["end"]
-        next_start = day_courses[i + 1]["start"]
-        
-        if current_end < next_start:
-            free_slots.append({
-                "start": current_end.strftime("%H:%M"),
-                "end": next_start.strftime("%H:%M"),
-                "description": f"Libre entre {day_courses[i]['title']} et {day_courses[i+1]['title']}"
-            })
     
-    # Créneau libre après le dernier cours
-    if day_courses[-1]["end"] < day_end:
+    for slot in table.free_slots(target_date):
+        if slot["before"] is None and slot["after"] is None:
+            description = "Toute la journée libre"
+        elif slot["before"] is None:
+            description = f"Libre avant {slot['after']}"
+        elif slot["after"] is None:
+            description = f"Libre après {slot['before']}"
+        else:
+            description = f"Libre entre {slot['before']} et {slot['after']}"
+        
         free_slots.append({
-            "start": day_courses[-1]["end"].strftime("%H:%M"),
-            "end": day_end.strftime("%H:%M"),
-            "description": f"Libre après {day_courses[-1]['title']}"
+            "start": slot["start"].strftime("%H:%M"),
+            "end": slot["end"].strftime("%H:%M"),
+            "description": description
         })
     
     return free_slots
@@ -395,57 +373,29 @@ def get_next_course(user_id: str) -> Dict[str, Any]:
     try:
         logger.info(f"🔍 Recherche prochain cours pour {user_id}")
         
-        data = load_schedule_data(user_id)
-        if not data:
+        index = get_schedule_index(user_id)
+        if not index:
             return {
                 "status": "error",
                 "message": "❌ Aucun emploi du temps trouvé"
             }
         
-        # Extraction des événements selon la structure
-        all_events = []
-        if isinstance(data, dict) and "emploi_du_temps" in data:
-            for semaine_data in data["emploi_du_temps"]:
-                all_events.extend(semaine_data.get("evenements", []))
-        elif isinstance(data, list):
-            all_events = data
-        
-        # Filtrage des cours futurs
+        # Recherche par dichotomie des cours futurs (le prochain + 3 suivants)
         now = datetime.now()
-        upcoming_courses = []
+        upcoming, total_upcoming = index.upcoming_courses(now, limit=4)
         
-        for event in all_events:
-            try:
-                debut_field = event.get("début") or event.get("start", "")
-                if not debut_field:
-                    continue
-                
-                # Parse date flexible
-                if "T" in debut_field:
-                    course_start = datetime.fromisoformat(debut_field.replace('T', ' ').split('+')[0])
-                else:
-                    course_start = datetime.strptime(debut_field, "%Y-%m-%d %H:%M")
-                
-                if course_start > now:
-                    nom_cours = event.get('nom_cours') or event.get('title', 'Cours')
-                    
-                    # Exclure les non-cours
-                    if not any(exclude in nom_cours for exclude in 
-                              ['Révision', 'VACANCES', 'Férié', 'révision']):
-                        
-                        upcoming_courses.append({
-                            "title": nom_cours,
-                            "start_datetime": course_start,
-                            "start": debut_field,
-                            "end": event.get('fin') or event.get('end', ''),
-                            "professeur": event.get('professeur', 'Inconnu'),
-                            "location": event.get('location', ''),
-                            "description": event.get('description', '')
-                        })
-                        
-            except Exception as e:
-                logger.warning(f"⚠️ Erreur traitement cours futur: {e}")
-                continue
+        upcoming_courses = [
+            {
+                "title": event.get('nom_cours') or event.get('title', 'Cours'),
+                "start_datetime": course_start,
+                "start": event.get("début") or event.get("start", ""),
+                "end": event.get('fin') or event.get('end', ''),
+                "professeur": event.get('professeur', 'Inconnu'),
+                "location": event.get('location', ''),
+                "description": event.get('description', '')
+            }
+            for course_start, event in upcoming
+        ]
         
         if not upcoming_courses:
             return {
@@ -454,8 +404,6 @@ def get_next_course(user_id: str) -> Dict[str, Any]:
                 "next_course": None
             }
         
-        # Trier et prendre le plus proche
-        upcoming_courses.sort(key=lambda x: x["start_datetime"])
         next_course = upcoming_courses[0]
         
         # Calcul du temps restant amélioré
@@ -483,7 +431,7 @@ def get_next_course(user_id: str) -> Dict[str, Any]:
                 "start": course["start"],
                 "professeur": course["professeur"]
             }
-            for course in upcoming_courses[1:4]  # 3 cours suivants
+            for course in upcoming_courses[1:]  # 3 cours suivants
         ]
         
         logger.info(f"✅ Prochain cours: {next_course['title']} dans {time_str}")
@@ -491,7 +439,7 @@ def get_next_course(user_id: str) -> Dict[str, Any]:
         return {
             "status": "success",
             "next_course": next_course,
-            "total_upcoming": len(upcoming_courses)
+            "total_upcoming": total_upcoming
         }
         
     except Exception as e:
@@ -502,90 +450,110 @@ def get_next_course(user_id: str) -> Dict[str, Any]:
         }
 
 
-def add_event_to_calendar(user_id: str, title: str, start_date: str, end_date: str, description: str = "") -> dict:
-    """Version améliorée avec validation et structure flexible."""
+def _build_revision_event(title: str, start_date: str, end_date: str, description: str = "") -> Dict[str, Any]:
+    """Valide les paramètres et construit l'événement de révision (ValueError avec le message d'erreur sinon)."""
+    # Validation des dates
     try:
-        logger.info(f"🎯 AJOUT ÉVÉNEMENT: {title} pour {user_id}")
-        
-        # Validation des dates
+        start_dt = datetime.fromisoformat(start_date.replace('T', ' ').split('+')[0])
+        end_dt = datetime.fromisoformat(end_date.replace('T', ' ').split('+')[0])
+    except ValueError as e:
+        raise ValueError(f"❌ Format de date invalide: {str(e)}")
+    if start_dt >= end_dt:
+        raise ValueError("❌ Date de fin doit être après la date de début")
+    
+    # Validation du titre
+    if not title.strip():
+        raise ValueError("❌ Le titre ne peut pas être vide")
+    
+    return {
+        "nom_cours": title,
+        "début": start_dt.strftime('%Y-%m-%d %H:%M'),
+        "fin": end_dt.strftime('%Y-%m-%d %H:%M'),
+        "description": description,
+        "professeur": "IA Assistant",
+        "location": "",
+        "extendedProps": {
+            "type": "revision",
+            "added_by_ai": True,
+            "created_at": datetime.now().isoformat(),
+            "color": "#10b981",
+            "textColor": "#ffffff"
+        }
+    }
+
+
+def add_events_to_calendar(user_id: str, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Ajoute plusieurs événements (dicts title/start_date/end_date/description) en une
+    seule lecture et une seule écriture du fichier. Retourne un résultat par événement,
+    dans l'ordre, au format de add_event_to_calendar.
+    """
+    results: List[Dict[str, Any]] = [None] * len(events)
+    accepted = []
+    for position, params in enumerate(events):
         try:
-            start_dt = datetime.fromisoformat(start_date.replace('T', ' ').split('+')[0])
-            end_dt = datetime.fromisoformat(end_date.replace('T', ' ').split('+')[0])
-            
-            if start_dt >= end_dt:
-                return {"success": False, "message": "❌ Date de fin doit être après la date de début"}
-                
-        except ValueError as e:
-            return {"success": False, "message": f"❌ Format de date invalide: {str(e)}"}
-        
-        # Validation du titre
-        if not title.strip():
-            return {"success": False, "message": "❌ Le titre ne peut pas être vide"}
-        
-        json_dir = "json_schedules"
-        os.makedirs(json_dir, exist_ok=True)
-        json_file = os.path.join(json_dir, f"{user_id}_edt.json")
+            accepted.append((position, _build_revision_event(**params)))
+        except (ValueError, TypeError) as e:
+            results[position] = {"success": False, "message": str(e) if isinstance(e, ValueError)
+                                 else f"❌ Paramètres invalides: {str(e)}"}
+    if not accepted:
+        return results
+    
+    try:
+        logger.info(f"🎯 AJOUT de {len(accepted)} ÉVÉNEMENT(S) pour {user_id}")
+        json_file = schedule_path(user_id)
         
-        # Charger structure existante
-        if os.path.exists(json_file):
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        else:
+        # Charger structure existante (depuis le cache partagé)
+        data = get_schedule(user_id)
+        if data is None:
             data = {"emploi_du_temps": [], "revisions": []}
         
-        # Créer l'événement
-        nouveau_event = {
-            "nom_cours": title,
-            "début": start_dt.strftime('%Y-%m-%d %H:%M'),
-            "fin": end_dt.strftime('%Y-%m-%d %H:%M'),
-            "description": description,
-            "professeur": "IA Assistant",
-            "location": "",
-            "extendedProps": {
-                "type": "revision",
-                "added_by_ai": True,
-                "created_at": datetime.now().isoformat(),
-                "color": "#10b981",
-                "textColor": "#ffffff"
-            }
-        }
-        
-        # Ajout selon la structure
+        # Ajout selon la structure (nouveaux conteneurs : les données en cache ne sont jamais modifiées)
+        nouveaux = [event for _, event in accepted]
         total_events = 0
         if isinstance(data, list):
-            data.append(nouveau_event)
+            data = data + nouveaux
             total_events = len(data)
         elif isinstance(data, dict):
-            if "revisions" not in data:
-                data["revisions"] = []
-            data["revisions"].append(nouveau_event)
+            data = {**data, "revisions": data.get("revisions", []) + nouveaux}
             total_events = len(data["revisions"])
         
-        # Sauvegarde avec backup
+        # Sauvegarde avec backup (une seule fois pour tout le lot)
         backup_file = f"{json_file}.backup"
         if os.path.exists(json_file):
             import shutil
             shutil.copy2(json_file, backup_file)
         
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        save_schedule(user_id, data)
         
-        logger.info(f"✅ Événement ajouté! Total: {total_events}")
+        logger.info(f"✅ {len(nouveaux)} événement(s) ajouté(s)! Total: {total_events}")
         
-        return {
-            "success": True,
-            "message": f"✅ '{title}' ajouté avec succès pour le {start_dt.strftime('%d/%m/%Y à %H:%M')}",
-            "event": nouveau_event,
-            "total_events": total_events,
-            "date_added": datetime.now().strftime('%d/%m/%Y %H:%M')
-        }
+        date_added = datetime.now().strftime('%d/%m/%Y %H:%M')
+        for position, event in accepted:
+            start_dt = datetime.strptime(event["début"], '%Y-%m-%d %H:%M')
+            results[position] = {
+                "success": True,
+                "message": f"✅ '{event['nom_cours']}' ajouté avec succès pour le {start_dt.strftime('%d/%m/%Y à %H:%M')}",
+                "event": event,
+                "total_events": total_events,
+                "date_added": date_added
+            }
         
     except Exception as e:
         logger.error(f"❌ Erreur ajout événement: {str(e)}")
-        return {
-            "success": False, 
-            "message": f"❌ Erreur lors de l'ajout: {str(e)}"
-        }
+        for position, _ in accepted:
+            results[position] = {
+                "success": False, 
+                "message": f"❌ Erreur lors de l'ajout: {str(e)}"
+            }
+    return results
+
+
+def add_event_to_calendar(user_id: str, title: str, start_date: str, end_date: str, description: str = "") -> dict:
+    """Version améliorée avec validation et structure flexible."""
+    return add_events_to_calendar(user_id, [{
+        "title": title, "start_date": start_date, "end_date": end_date, "description": description
+    }])[0]
 
 
 def remove_revision_events(user_id: str) -> dict:
@@ -593,10 +561,10 @@ def remove_revision_events(user_id: str) -> dict:
     try:
         logger.info(f"🗑️ SUPPRESSION révisions pour {user_id}")
         
-        json_dir = "json_schedules"
-        json_file = os.path.join(json_dir, f"{user_id}_edt.json")
+        json_file = schedule_path(user_id)
         
-        if not os.path.exists(json_file):
+        data = get_schedule(user_id)
+        if data is None:
             return {
                 "success": False, 
                 "message": "❌ Aucun fichier emploi du temps trouvé"
@@ -607,9 +575,6 @@ def remove_revision_events(user_id: str) -> dict:
         import shutil
         shutil.copy2(json_file, backup_file)
         
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
         removed_count = 0
         removed_events = []
         
@@ -618,8 +583,8 @@ def remove_revision_events(user_id: str) -> dict:
             original_count = len(data)
             removed_events = [event for event in data 
                             if event.get("extendedProps", {}).get("added_by_ai", False)]
-            data[:] = [event for event in data 
-                        if not event.get("extendedProps", {}).get("added_by_ai", False)]
+            data = [event for event in data 
+                    if not event.get("extendedProps", {}).get("added_by_ai", False)]
             removed_count = original_count - len(data)
             
         elif isinstance(data, dict):
@@ -627,11 +592,10 @@ def remove_revision_events(user_id: str) -> dict:
             if "revisions" in data:
                 removed_events = data["revisions"].copy()
                 removed_count = len(removed_events)
-                data["revisions"] = []
+                data = {**data, "revisions": []}
         
         # Sauvegarder
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        save_schedule(user_id, data)
         
         # Statistiques
         if removed_events:
@@ -664,15 +628,10 @@ def remove_revision_events(user_id: str) -> dict:
 def remove_revision_events(user_id: str) -> dict:
     """Supprime les révisions selon la structure du fichier"""
     try:
-        json_dir = "json_schedules"
-        json_file = os.path.join(json_dir, f"{user_id}_edt.json")
-        
-        if not os.path.exists(json_file):
+        data = get_schedule(user_id)
+        if data is None:
             return {"success": False, "message": "❌ Aucun fichier trouvé"}
         
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
         removed_count = 0
         
         if isinstance(data, list):
@@ -685,11 +644,10 @@ def remove_revision_events(user_id: str) -> dict:
         elif isinstance(data, dict):
             # Structure objet : vider les révisions
             removed_count = len(data.get("revisions", []))
-            data["revisions"] = []
+            data = {**data, "revisions": []}
         
         # Sauvegarder
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        save_schedule(user_id, data)
         
         return {
             "success": True,
@@ -702,6 +660,110 @@ def remove_revision_events(user_id: str) -> dict:
 
 
 
+# Outils qui modifient l'emploi du temps : exécutés en série, après les lectures du même tour
+MUTATING_FUNCTIONS = {"add_event_to_calendar", "remove_revision_events"}
+# Outils dont le résultat dépend de l'heure courante : jamais mémorisés
+TIME_DEPENDENT_FUNCTIONS = {"get_next_course"}
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "4"))
+TOOL_MEMO_SIZE = int(os.getenv("TOOL_MEMO_SIZE", "64"))
+
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+
+
+def _get_tool_executor() -> ThreadPoolExecutor:
+    """Pool partagé par toutes les sessions pour les outils en lecture."""
+    global _tool_executor
+    with _tool_executor_lock:
+        if _tool_executor is None:
+            _tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tools")
+        return _tool_executor
+
+
+def _call_tool(user_id: str, function_name: str, function_args: Dict[str, Any]) -> Any:
+    try:
+        # user_id est passé explicitement comme premier paramètre
+        return AVAILABLE_FUNCTIONS[function_name](user_id, **function_args)
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de l'appel de {function_name}: {e}")
+        return {"error": str(e)}
+
+
+def _is_error(result: Any) -> bool:
+    return isinstance(result, dict) and ("error" in result or result.get("status") == "error")
+
+
+def tool_memo_key(user_id: str, function_name: str, function_args: Dict[str, Any], version) -> tuple:
+    """Clé de mémo d'un appel en lecture : une modification du fichier change `version`."""
+    return (user_id, function_name, json.dumps(function_args, sort_keys=True, ensure_ascii=False), version)
+
+
+def execute_tool_calls(user_id: str, calls: List[tuple], memo: Dict[tuple, Any] = None) -> List[Any]:
+    """
+    Exécute les tool calls d'un même tour de modèle. `calls` est une liste de
+    (nom de fonction, arguments) ; les résultats sont rendus dans le même ordre.
+
+    - les lectures partent en parallèle sur un pool de threads et lisent toutes le même
+      emploi du temps (chargé une fois dans le cache partagé avant leur lancement) ;
+    - les modifications s'exécutent une fois les lectures terminées, en série dans l'ordre demandé, les
+      add_event_to_calendar consécutifs étant regroupés en une seule écriture.
+
+    Avec `memo` (dict propre à une session), les lectures déjà faites sur la même
+    version du fichier sont servies sans être ré-exécutées.
+    """
+    results: List[Any] = [None] * len(calls)
+    version = schedule_version(user_id) if memo is not None else None
+    
+    futures = {}
+    keys = {}
+    for position, (function_name, function_args) in enumerate(calls):
+        if function_name not in AVAILABLE_FUNCTIONS:
+            results[position] = {"error": f"Fonction inconnue: {function_name}"}
+        elif function_name not in MUTATING_FUNCTIONS:
+            if memo is not None and version is not None and function_name not in TIME_DEPENDENT_FUNCTIONS:
+                key = tool_memo_key(user_id, function_name, function_args, version)
+                if key in memo:
+                    logger.info(f"♻️ Résultat mémorisé pour {function_name}")
+                    results[position] = memo[key]
+                    continue
+                keys[position] = key
+            futures[position] = None
+    
+    if futures:
+        get_schedule(user_id)
+        executor = _get_tool_executor()
+        for position in futures:
+            function_name, function_args = calls[position]
+            futures[position] = executor.submit(_call_tool, user_id, function_name, function_args)
+    
+    # Les lectures voient l'état d'avant les modifications du tour
+    for position, future in futures.items():
+        results[position] = future.result()
+        if position in keys and not _is_error(results[position]):
+            memo[keys[position]] = results[position]
+    if memo is not None:
+        while len(memo) > TOOL_MEMO_SIZE:
+            memo.pop(next(iter(memo)))
+    
+    pending_adds = []
+    
+    def flush_adds():
+        if pending_adds:
+            batch = add_events_to_calendar(user_id, [args for _, args in pending_adds])
+            for (position, _), result in zip(pending_adds, batch):
+                results[position] = result
+            pending_adds.clear()
+    
+    for position, (function_name, function_args) in enumerate(calls):
+        if function_name == "add_event_to_calendar":
+            pending_adds.append((position, function_args))
+        elif function_name in MUTATING_FUNCTIONS:
+            flush_adds()
+            results[position] = _call_tool(user_id, function_name, function_args)
+    flush_adds()
+    return results
+
+
 AVAILABLE_FUNCTIONS = {
     "get_courses_by_date_range": get_courses_by_date_range,
     "get_courses_by_subject": get_courses_by_subject, 
@@ -0,0 +1,209 @@
+import json
+import os
+import tempfile
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+logger = logging.getLogger(__name__)
+
+JSON_DIR = "json_schedules"
+# Nombre maximal d'emplois du temps gardés en mémoire (LRU)
+SCHEDULE_CACHE_SIZE = int(os.getenv("SCHEDULE_CACHE_SIZE", "64"))
+
+# user_id -> {"stamp": (mtime_ns, taille), "data": données JSON parsées, + vues dérivées ("index"...)}
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_lock = threading.RLock()
+
+
+def schedule_path(user_id: str) -> str:
+    """Chemin du fichier JSON de l'emploi du temps d'un utilisateur."""
+    return os.path.join(JSON_DIR, f"{user_id}_edt.json")
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """Empreinte (mtime, taille) du fichier, None s'il n'existe pas."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _store(user_id: str, data: Any, stamp: Tuple[int, int]) -> Dict[str, Any]:
+    with _lock:
+        entry = {"stamp": stamp, "data": data}
+        _cache[user_id] = entry
+        _cache.move_to_end(user_id)
+        while len(_cache) > SCHEDULE_CACHE_SIZE:
+            evicted, _ = _cache.popitem(last=False)
+            logger.info(f"♻️ Emploi du temps de {evicted} retiré du cache")
+        return entry
+
+
+def _get_entry(user_id: str) -> Optional[Dict[str, Any]]:
+    """Entrée de cache à jour pour l'utilisateur (relit le fichier si besoin)."""
+    path = schedule_path(user_id)
+    # L'empreinte est prise AVANT la lecture : si le fichier change entre les deux,
+    # l'entrée sera simplement rechargée au prochain appel.
+    stamp = _file_stamp(path)
+    if stamp is None:
+        invalidate_schedule(user_id)
+        return None
+
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry["stamp"] == stamp:
+            _cache.move_to_end(user_id)
+            return entry
+
+    logger.info(f"📂 Lecture de {path}")
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return _store(user_id, data, stamp)
+
+
+def get_schedule(user_id: str) -> Any:
+    """
+    Retourne les données JSON parsées de l'emploi du temps, ou None si le fichier n'existe pas.
+
+    Le fichier n'est relu que si sa date de modification ou sa taille a changé.
+    L'objet retourné est partagé entre les appels : il ne doit pas être modifié,
+    utiliser save_schedule() pour écrire une nouvelle version.
+    """
+    entry = _get_entry(user_id)
+    return entry["data"] if entry is not None else None
+
+
+def save_schedule(user_id: str, data: Any) -> None:
+    """Écrit l'emploi du temps sur disque et met à jour le cache sans relecture."""
+    path = schedule_path(user_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Fichier temporaire propre à chaque écriture : deux sauvegardes simultanées ne se mélangent pas
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        invalidate_schedule(user_id)
+        raise
+    _store(user_id, data, _file_stamp(path))
+
+
+def get_schedule_view(user_id: str, name: str, builder: Callable[[Any], Any]) -> Any:
+    """
+    Vue dérivée des données (index, table...) construite par `builder` une seule fois
+    par version du fichier, puis gardée dans l'entrée de cache. None si le fichier n'existe pas.
+    """
+    entry = _get_entry(user_id)
+    if entry is None:
+        return None
+    view = entry.get(name)
+    if view is None:
+        view = builder(entry["data"])
+        entry[name] = view
+    return view
+
+
+def get_schedule_index(user_id: str) -> Optional["ScheduleIndex"]:
+    """Index trié des événements de l'utilisateur (None si le fichier n'existe pas)."""
+    return get_schedule_view(user_id, "index", ScheduleIndex)
+
+
+def schedule_version(user_id: str) -> Optional[Tuple[int, int]]:
+    """Version courante du fichier (mtime, taille), None s'il n'existe pas."""
+    return _file_stamp(schedule_path(user_id))
+
+
+def invalidate_schedule(user_id: Optional[str] = None) -> None:
+    """Retire un utilisateur (ou tout le monde si user_id est None) du cache."""
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+
+# Titres qui ne correspondent pas à de vrais cours (révisions IA, vacances, jours fériés)
+NON_COURSE_KEYWORDS = ['Révision', 'VACANCES', 'Férié', 'révision']
+
+
+def iter_schedule_events(data: Any) -> Iterator[Dict[str, Any]]:
+    """Parcourt les événements de cours quelle que soit la structure du fichier."""
+    if isinstance(data, dict) and "emploi_du_temps" in data:
+        for semaine_data in data["emploi_du_temps"]:
+            yield from semaine_data.get("evenements", [])
+    elif isinstance(data, list):
+        yield from data
+
+
+def parse_event_datetime(value: str) -> datetime:
+    """Parse 'YYYY-MM-DD HH:MM' (format du scraper) ou une date ISO 'YYYY-MM-DDTHH:MM[:SS][+TZ]'."""
+    if "T" in value:
+        return datetime.fromisoformat(value.replace('T', ' ').split('+')[0])
+    return datetime.strptime(value, "%Y-%m-%d %H:%M")
+
+
+def is_course_title(title: str) -> bool:
+    """Vrai si le titre correspond à un cours (et non à une révision, des vacances...)."""
+    return not any(keyword in title for keyword in NON_COURSE_KEYWORDS)
+
+
+def clean_course_title(title: str) -> str:
+    """
+    Titre lisible sur une ligne : "Cm : Microéco 3 \nG.Lagadec  \nAte : A7 [Edt-Ens]"
+    devient "Cm : Microéco 3 - G.Lagadec - Ate : A7".
+    """
+    parts = [" ".join(part.split()) for part in title.replace("[Edt-Ens]", "").split("\n")]
+    return " - ".join(part for part in parts if part)
+
+
+class ScheduleIndex:
+    """
+    Événements d'un emploi du temps triés par date de début, avec les dates déjà parsées.
+
+    Les recherches par plage de dates et du prochain cours se font par dichotomie (bisect).
+    """
+
+    def __init__(self, data: Any):
+        parsed = []
+        for event in iter_schedule_events(data):
+            debut_field = event.get("début") or event.get("start", "")
+            if not debut_field:
+                continue
+            try:
+                parsed.append((parse_event_datetime(debut_field), event))
+            except ValueError as e:
+                logger.warning(f"⚠️ Date invalide ignorée ({debut_field}): {e}")
+
+        parsed.sort(key=lambda item: item[0])
+        self.starts: List[datetime] = [start for start, _ in parsed]
+        self.events: List[Dict[str, Any]] = [event for _, event in parsed]
+
+        # Sous-index des vrais cours (pour la recherche du prochain cours)
+        courses = [
+            (start, event) for start, event in parsed
+            if is_course_title(event.get('nom_cours') or event.get('title', 'Cours'))
+        ]
+        self.course_starts: List[datetime] = [start for start, _ in courses]
+        self.course_events: List[Dict[str, Any]] = [event for _, event in courses]
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def between(self, start_dt: datetime, end_dt: datetime) -> List[Tuple[datetime, Dict[str, Any]]]:
+        """Événements dont le début est dans [start_dt, end_dt] (bornes incluses)."""
+        lo = bisect_left(self.starts, start_dt)
+        hi = bisect_right(self.starts, end_dt)
+        return list(zip(self.starts[lo:hi], self.events[lo:hi]))
+
+    def upcoming_courses(self, after: datetime, limit: int) -> Tuple[List[Tuple[datetime, Dict[str, Any]]], int]:
+        """Les `limit` prochains cours strictement après `after`, et le nombre total de cours à venir."""
+        i = bisect_right(self.course_starts, after)
+        upcoming = list(zip(self.course_starts[i:i + limit], self.course_events[i:i + limit]))
+        return upcoming, len(self.course_starts) - i
@@ -1,70 +1,202 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
 import os
-import openai
+import tempfile
+import threading
+import time
 import requests
-from ics import Calendar
 import pytz
-from dotenv import load_dotenv
 import json
 import logging
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
+from urllib.parse import urlsplit
+
+from ics_parser import iter_ics_lines, iter_vevents
+from schedule_store import JSON_DIR, get_schedule, save_schedule
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
+ICS_URL = "http://applis.univ-nc.nc/cgi-bin/WebObjects/EdtWeb.woa/2/wa/default?login={user_id}%2Fical"
+
+# Réglages HTTP (surchargeables par variables d'environnement)
+HTTP_TIMEOUT = float(os.getenv("EDT_HTTP_TIMEOUT", "30"))
+HTTP_CHUNK_SIZE = 64 * 1024
+HTTP_POOL_SIZE = int(os.getenv("EDT_HTTP_POOL_SIZE", "16"))
+HTTP_RETRIES = int(os.getenv("EDT_HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("EDT_HTTP_BACKOFF", "1.0"))
+REQUESTS_PER_SECOND = float(os.getenv("EDT_REQUESTS_PER_SECOND", "4"))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Session HTTP partagée (connexions keep-alive réutilisées entre les requêtes et les threads)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+class HostRateLimiter:
+    """Espace les requêtes vers un même hôte d'au moins 1 / requests_per_second secondes."""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_rate_limiter = HostRateLimiter(REQUESTS_PER_SECOND)
+
+
+def http_get(url: str, headers: Optional[Dict[str, str]] = None, retries: int = HTTP_RETRIES,
+             backoff: float = HTTP_BACKOFF, rate_limiter: Optional[HostRateLimiter] = None,
+             stream: bool = False) -> requests.Response:
+    """
+    GET via la session partagée, avec limitation de débit par hôte et nouvelles tentatives
+    (backoff exponentiel) sur les erreurs réseau, les 429 et les 5xx.
+    Avec stream=True le corps est lu à la demande (response.iter_content).
+    """
+    rate_limiter = rate_limiter or _rate_limiter
+    for attempt in range(retries + 1):
+        rate_limiter.wait(url)
+        try:
+            response = get_http_session().get(url, headers=headers, timeout=HTTP_TIMEOUT, stream=stream)
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            if attempt == retries:
+                return response
+            response.close()
+            logger.warning(f"⚠️ HTTP {response.status_code} sur {url}, nouvelle tentative ({attempt + 1}/{retries})")
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"⚠️ Erreur réseau ({e}), nouvelle tentative ({attempt + 1}/{retries})")
+        time.sleep(backoff * (2 ** attempt))
+
+
+def _fetch_meta_path(user_id: str) -> str:
+    """Fichier des métadonnées HTTP (ETag, Last-Modified, hash) du dernier téléchargement."""
+    return os.path.join(JSON_DIR, f"{user_id}_edt.meta.json")
+
+
+def _load_fetch_meta(user_id: str) -> Dict[str, Any]:
+    try:
+        with open(_fetch_meta_path(user_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_fetch_meta(user_id: str, meta: Dict[str, Any]) -> None:
+    os.makedirs(JSON_DIR, exist_ok=True)
+    path = _fetch_meta_path(user_id)
+    # Écriture atomique dans un fichier temporaire unique, comme save_schedule
+    fd, tmp_path = tempfile.mkstemp(dir=JSON_DIR, prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _conditional_headers(meta: Dict[str, Any]) -> Dict[str, str]:
+    """En-têtes de requête conditionnelle à partir du dernier téléchargement."""
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def _unchanged_result(existing: Dict[str, Any]) -> Dict[str, Any]:
+    """Données déjà sur disque, marquées comme inchangées (sans modifier l'objet en cache)."""
+    return {**existing, "metadata": {**existing.get("metadata", {}), "unchanged": True}}
+
+
+def _read_chunks(response: requests.Response, hasher) -> List[bytes]:
+    """Lit le corps de la réponse par morceaux en calculant son hash au passage."""
+    chunks = []
+    with response:
+        for chunk in response.iter_content(chunk_size=HTTP_CHUNK_SIZE):
+            hasher.update(chunk)
+            chunks.append(chunk)
+    return chunks
+
 def get_edt(user_id: str) -> List[Dict[str, str]]:
     """Récupère l'emploi du temps complet avec gestion d'erreurs améliorée."""
     try:
         logger.info(f"🔄 Récupération EDT pour {user_id}")
         
-        ics_url = f"http://applis.univ-nc.nc/cgi-bin/WebObjects/EdtWeb.woa/2/wa/default?login={user_id}%2Fical"
+        ics_url = ICS_URL.format(user_id=user_id)
         
-        # Requête avec timeout et retry
-        response = requests.get(ics_url, timeout=30)
-        response.encoding = "UTF-8"
+        # Requête avec timeout et retry, corps lu en flux
+        response = http_get(ics_url, stream=True)
         
         if not response.ok:
+            response.close()
             logger.error(f"❌ Erreur HTTP {response.status_code} pour {user_id}")
             raise Exception(f"Identifiant invalide ou serveur inaccessible (Code: {response.status_code}) 🚫")
 
-        cal = Calendar(response.text)
         cours = []
         local_tz = pytz.timezone("Pacific/Noumea")
         
-        logger.info(f"📅 Traitement de {len(cal.events)} événements")
+        # Parsing au fil de l'eau : seuls les champs utiles sont extraits, déjà convertis en heure locale
+        with response:
+            events = iter_vevents(iter_ics_lines(response.iter_content(chunk_size=HTTP_CHUNK_SIZE)), local_tz)
+            for i, event in enumerate(events):
+                try:
+                    start_local = event["begin"].strftime('%Y-%m-%d %H:%M')
+                    end_local = event["end"].strftime('%Y-%m-%d %H:%M')
 
-        for i, event in enumerate(cal.events):
-            try:
-                # Conversion timezone sécurisée
-                start_local = event.begin.astimezone(local_tz).strftime('%Y-%m-%d %H:%M')
-                end_local = event.end.astimezone(local_tz).strftime('%Y-%m-%d %H:%M')
+                    # Nettoyage des noms
+                    nom_coupee = (event["summary"] or "Cours sans nom").split('(')[0].strip()
+                    description_coupee = (event["description"] or "").split('(')[0].strip()
 
-                # Nettoyage des noms
-                nom_coupee = (event.name or "Cours sans nom").split('(')[0].strip()
-                description_coupee = (event.description or "").split('(')[0].strip()
-                
-                # Extraction du professeur depuis la description
-                professeur = "Inconnu"
-                if event.description and '\n' in event.description:
-                    lines = event.description.split('\n')
-                    for line in lines:
-                        if any(keyword in line.lower() for keyword in ['prof', 'enseignant', 'teacher']):
-                            professeur = line.strip()
-                            break
+                    # Extraction du professeur depuis la description
+                    professeur = "Inconnu"
+                    if event["description"] and '\n' in event["description"]:
+                        lines = event["description"].split('\n')
+                        for line in lines:
+                            if any(keyword in line.lower() for keyword in ['prof', 'enseignant', 'teacher']):
+                                professeur = line.strip()
+                                break
 
-                cours.append({
-                    "nom_cours": nom_coupee,
-                    "début": start_local,
-                    "fin": end_local,
-                    "description": description_coupee,
-                    "professeur": professeur,
-                    "location": getattr(event, 'location', '') or ''
-                })
-                
-            except Exception as e:
-                logger.warning(f"⚠️ Erreur traitement événement {i+1}: {e}")
-                continue
+                    cours.append({
+                        "nom_cours": nom_coupee,
+                        "début": start_local,
+                        "fin": end_local,
+                        "description": description_coupee,
+                        "professeur": professeur,
+                        "location": event["location"] or ''
+                    })
+
+                except Exception as e:
+                    logger.warning(f"⚠️ Erreur traitement événement {i+1}: {e}")
+                    continue
 
         logger.info(f"✅ {len(cours)} cours récupérés pour {user_id}")
         return cours
@@ -77,41 +209,78 @@ def get_edt(user_id: str) -> List[Dict[str, str]]:
         logger.error(f"❌ Erreur get_edt: {str(e)}")
         raise
 
-def get_edt_semaine(user_id: str) -> Dict[str, Any]:
-    """Version améliorée avec structure organisée par semaine et sauvegarde automatique."""
+def get_edt_semaine(user_id: str, force: bool = False,
+                    fetch: Callable[..., requests.Response] = http_get) -> Dict[str, Any]:
+    """
+    Version améliorée avec structure organisée par semaine et sauvegarde automatique.
+
+    La requête est conditionnelle (ETag / Last-Modified) et le contenu est comparé au hash
+    du dernier téléchargement : si rien n'a changé, le fichier existant est retourné sans
+    parsing ICS ni réécriture du JSON (metadata["unchanged"] vaut alors True).
+    `force=True` ignore ces vérifications. `fetch` permet de fournir un http_get préconfiguré.
+    """
     try:
         logger.info(f"🗓️ Récupération EDT par semaine pour {user_id}")
         
-        ics_url = f"http://applis.univ-nc.nc/cgi-bin/WebObjects/EdtWeb.woa/2/wa/default?login={user_id}%2Fical"
-        response = requests.get(ics_url, timeout=30)
-        response.encoding = "UTF-8"
+        try:
+            existing = get_schedule(user_id)
+        except (OSError, ValueError) as e:
+            # Fichier illisible ou corrompu : téléchargement complet qui le remplacera
+            logger.warning(f"⚠️ Emploi du temps existant illisible pour {user_id}, il sera remplacé: {e}")
+            existing = None
+        has_data = isinstance(existing, dict) and bool(existing.get("emploi_du_temps"))
+        meta = _load_fetch_meta(user_id) if has_data and not force else {}
+        
+        ics_url = ICS_URL.format(user_id=user_id)
+        response = fetch(ics_url, headers=_conditional_headers(meta), stream=True)
+        
+        if response.status_code == 304:
+            response.close()
+            logger.info(f"✅ EDT inchangé pour {user_id} (304 Not Modified)")
+            return _unchanged_result(existing)
         
         if not response.ok:
+            response.close()
             raise Exception(f"Identifiant invalide ou serveur inaccessible (Code: {response.status_code}) 🚫")
 
-        cal = Calendar(response.text)
+        # Corps lu par morceaux et hashé au passage ; le parsing n'a lieu que s'il a changé
+        hasher = hashlib.sha256()
+        chunks = _read_chunks(response, hasher)
+        new_meta = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha256": hasher.hexdigest(),
+            "fetched_at": datetime.now().isoformat()
+        }
+        
+        if meta.get("sha256") == new_meta["sha256"]:
+            logger.info(f"✅ EDT inchangé pour {user_id} (contenu identique)")
+            _save_fetch_meta(user_id, new_meta)
+            return _unchanged_result(existing)
+
         cours_par_semaine = defaultdict(list)
         local_tz = pytz.timezone("Pacific/Noumea")
         
         stats = {"total_events": 0, "processed": 0, "errors": 0}
 
-        logger.info(f"📅 Traitement de {len(cal.events)} événements")
+        logger.info(f"📅 Traitement de {sum(len(chunk) for chunk in chunks)} octets d'ICS")
 
-        for event in cal.events:
+        # Parseur VEVENT en flux : seuls les champs utiles, déjà convertis en heure locale
+        for event in iter_vevents(iter_ics_lines(chunks), local_tz):
             try:
                 stats["total_events"] += 1
                 
-                start_local = event.begin.astimezone(local_tz)
-                end_local = event.end.astimezone(local_tz)
+                start_local = event["begin"]
+                end_local = event["end"]
                 week_num = start_local.isocalendar()[1]
                 
-                nom_coupee = (event.name or "Cours sans nom").split('(')[0].strip()
-                description_coupee = (event.description or "").split('(')[0].strip()
+                nom_coupee = (event["summary"] or "Cours sans nom").split('(')[0].strip()
+                description_coupee = (event["description"] or "").split('(')[0].strip()
                 
                 # Extraction professeur améliorée
                 professeur = "Inconnu"
-                if event.description:
-                    desc_lines = event.description.split('\n')
+                if event["description"]:
+                    desc_lines = event["description"].split('\n')
                     for line in desc_lines:
                         line = line.strip()
                         # Pattern pour professeur: "P.Nom" ou contient "prof"/"enseignant"
@@ -126,7 +295,7 @@ def get_edt_semaine(user_id: str) -> Dict[str, Any]:
                     "fin": end_local.strftime('%Y-%m-%d %H:%M'),
                     "description": description_coupee,
                     "professeur": professeur,
-                    "location": getattr(event, 'location', '') or ''
+                    "location": event["location"] or ''
                 }
                 
                 cours_par_semaine[week_num].append(cours_data)
@@ -155,15 +324,11 @@ def get_edt_semaine(user_id: str) -> Dict[str, Any]:
             }
         }
         
-        # Sauvegarder automatiquement
-        json_dir = "json_schedules"
-        os.makedirs(json_dir, exist_ok=True)
-        json_file = os.path.join(json_dir, f"{user_id}_edt.json")
+        # Sauvegarder automatiquement (met aussi à jour le cache partagé)
+        save_schedule(user_id, result)
+        _save_fetch_meta(user_id, new_meta)
         
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
-        
-        logger.info(f"✅ Fichier sauvegardé: {json_file}")
+        logger.info(f"✅ Fichier sauvegardé pour {user_id}")
         logger.info(f"📊 {stats['processed']} cours organisés en {len(cours_par_semaine)} semaines")
         
         # Affichage des premières semaines pour debug
@@ -177,3 +342,81 @@ def get_edt_semaine(user_id: str) -> Dict[str, Any]:
     except Exception as e:
         logger.error(f"❌ Erreur get_edt_semaine: {str(e)}")
         raise Exception(f"Impossible de récupérer l'emploi du temps: {str(e)}")
+
+
+def fetch_edt_bulk(user_ids: List[str], max_workers: int = 8, requests_per_second: float = REQUESTS_PER_SECOND,
+                   retries: int = HTTP_RETRIES, backoff: float = HTTP_BACKOFF, force: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Récupère et sauvegarde en parallèle les emplois du temps de plusieurs utilisateurs.
+
+    Les requêtes passent par la session HTTP partagée, au plus `max_workers` à la fois,
+    limitées à `requests_per_second` par hôte et retentées avec backoff exponentiel.
+
+    Returns:
+        dict: pour chaque user_id, {"status": "updated" | "unchanged" | "error",
+              "duration": secondes, "courses": nombre de cours, "error": message éventuel}
+    """
+    limiter = HostRateLimiter(requests_per_second)
+
+    def fetch(url, headers=None, stream=False):
+        return http_get(url, headers=headers, retries=retries, backoff=backoff, rate_limiter=limiter, stream=stream)
+
+    def ingest(user_id):
+        started = time.perf_counter()
+        try:
+            result = get_edt_semaine(user_id, force=force, fetch=fetch)
+            metadata = result.get("metadata", {})
+            return {
+                "status": "unchanged" if metadata.get("unchanged") else "updated",
+                "duration": time.perf_counter() - started,
+                "courses": metadata.get("stats", {}).get("processed", 0)
+            }
+        except Exception as e:
+            return {"status": "error", "duration": time.perf_counter() - started, "error": str(e)}
+
+    # Une seule entrée par utilisateur, dans l'ordre d'origine
+    user_ids = list(dict.fromkeys(user_ids))
+    report: Dict[str, Dict[str, Any]] = {}
+    started = time.perf_counter()
+    get_http_session()  # création de la session avant le lancement des threads
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(ingest, user_id): user_id for user_id in user_ids}
+        for future in as_completed(futures):
+            user_id = futures[future]
+            report[user_id] = future.result()
+            logger.info(f"📥 {user_id}: {report[user_id]['status']} en {report[user_id]['duration']:.2f}s")
+
+    errors = sum(1 for r in report.values() if r["status"] == "error")
+    logger.info(f"✅ {len(user_ids)} emplois du temps traités en {time.perf_counter() - started:.2f}s ({errors} erreur(s))")
+    return {user_id: report[user_id] for user_id in user_ids}
+
+
+if __name__ == "__main__":
+    # Pré-chargement d'une promotion : python scrap_edt.py id1 id2 ... ou --file identifiants.txt
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Récupération en masse des emplois du temps")
+    parser.add_argument("user_ids", nargs="*", help="Identifiants des étudiants")
+    parser.add_argument("--file", help="Fichier contenant un identifiant par ligne")
+    parser.add_argument("--workers", type=int, default=8, help="Nombre de téléchargements simultanés")
+    parser.add_argument("--rps", type=float, default=REQUESTS_PER_SECOND, help="Requêtes par seconde vers le serveur")
+    parser.add_argument("--retries", type=int, default=HTTP_RETRIES, help="Nouvelles tentatives par utilisateur")
+    parser.add_argument("--force", action="store_true", help="Ignore ETag/hash et retélécharge tout")
+    args = parser.parse_args()
+
+    from log_config import setup_logging
+    setup_logging("scrap_edt")
+
+    ids = list(args.user_ids)
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            ids.extend(f)
+    # Même normalisation que l'application : un étudiant a un seul fichier quelle que soit la saisie
+    ids = [uid.strip().lower() for uid in ids if uid.strip()]
+
+    bulk_report = fetch_edt_bulk(ids, max_workers=args.workers, requests_per_second=args.rps,
+                                 retries=args.retries, force=args.force)
+    for uid, entry in bulk_report.items():
+        detail = entry.get("error") or f"{entry.get('courses', 0)} cours"
+        print(f"{uid:<20} {entry['status']:<10} {entry['duration']:6.2f}s  {detail}")
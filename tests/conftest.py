@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Embeddings locaux : les tests n'appellent pas l'API OpenAI
+os.environ.setdefault("EMBEDDING_BACKEND", "local")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,42 @@
+import pytest
+from langchain_core.documents import Document
+
+import faiss_handler
+
+
+@pytest.fixture(autouse=True)
+def faiss_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(faiss_handler, "FAISS_PATH", str(tmp_path / "faiss_data"))
+    monkeypatch.setattr(faiss_handler, "_partitions", {})
+
+
+def _documents(user_id, count=3):
+    return [Document(page_content=f"Cours {i} de {user_id}",
+                     metadata={"user_id": user_id, "event_id": f"{user_id}-{i}", "date": "2025-02-10"})
+            for i in range(count)]
+
+
+def _failing_embeddings(documents):
+    raise RuntimeError("embedding indisponible")
+    yield
+
+
+def test_save_to_faiss_raises_when_embedding_fails(monkeypatch):
+    monkeypatch.setattr(faiss_handler, "_iter_embedded", _failing_embeddings)
+    with pytest.raises(RuntimeError):
+        faiss_handler.save_to_faiss(_documents("alice"))
+
+
+def test_save_to_faiss_raises_for_failed_users_in_parallel(monkeypatch):
+    monkeypatch.setattr(faiss_handler, "_iter_embedded", _failing_embeddings)
+    with pytest.raises(RuntimeError, match="alice"):
+        faiss_handler.save_to_faiss(_documents("alice") + _documents("bob"))
+
+
+def test_save_to_faiss_raises_when_updating_existing_partition_fails(monkeypatch):
+    faiss_handler.save_to_faiss(_documents("alice"))
+    monkeypatch.setattr(faiss_handler, "_iter_embedded", _failing_embeddings)
+    with pytest.raises(RuntimeError):
+        faiss_handler.save_to_faiss(_documents("alice", count=4))
+    partition = faiss_handler._get_partition("alice")
+    assert partition.vector_store is None and partition.version is None
@@ -0,0 +1,36 @@
+from datetime import date
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, is_cacheable_prompt, normalize_prompt
+
+TODAY = date(2025, 2, 12)
+
+
+@pytest.fixture(autouse=True)
+def no_embeddings(monkeypatch):
+    monkeypatch.setattr(response_cache, "_embed", lambda text: None)
+
+
+@pytest.mark.parametrize("prompt", ["et les td ?", "et après les cours ?", "et demain ?", "mes révisions"])
+def test_follow_up_is_not_cacheable(prompt):
+    assert not is_cacheable_prompt(normalize_prompt(prompt, TODAY))
+
+
+@pytest.mark.parametrize("prompt", ["mes td cette semaine", "mes cours demain", "mon prochain cours", "cours le 14/02"])
+def test_anchored_prompt_is_cacheable(prompt):
+    assert is_cacheable_prompt(normalize_prompt(prompt, TODAY))
+
+
+def test_follow_up_is_not_stored():
+    cache = ResponseCache()
+    cache.store("test-user", "et les td ?", "Tu as 2 TD jeudi.", today=TODAY)
+    assert cache.lookup("test-user", "et les td ?", today=TODAY) is None
+
+
+def test_week_and_day_do_not_share_an_entry():
+    cache = ResponseCache()
+    cache.store("test-user", "mes td cette semaine", "3 TD cette semaine.", today=TODAY)
+    assert cache.lookup("test-user", "mes td cette semaine", today=TODAY) == "3 TD cette semaine."
+    assert cache.lookup("test-user", "mes td lundi", today=TODAY) is None
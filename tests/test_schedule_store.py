@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
+import pytest
+
+import schedule_store
+
+
+@pytest.fixture(autouse=True)
+def json_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(schedule_store, "JSON_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_concurrent_saves_publish_a_complete_file(json_dir):
+    schedules = [{"cours": [{"title": f"Cours {writer}", "start": "2025-02-10T08:00:00"}] * 200}
+                 for writer in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda data: schedule_store.save_schedule("alice", data), schedules * 5))
+    with open(schedule_store.schedule_path("alice"), encoding="utf-8") as f:
+        assert json.load(f) in schedules
+    assert os.listdir(json_dir) == ["alice_edt.json"]
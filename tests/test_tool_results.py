@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from embedding_pipeline import count_tokens
+from tool_results import compact_tool_result
+
+
+def _result(count=120):
+    courses = [{"start": f"2025-02-{10 + i % 5}T{8 + i % 8:02d}:00:00",
+                "end": f"2025-02-{10 + i % 5}T{9 + i % 8:02d}:30:00",
+                "title": f"Cm : Cours {i % 23} \nProf {i % 7}\nAte : A{i % 9} [Edt-Ens]",
+                "professeur": f"Prof {i % 7}", "location": ""}
+               for i in range(count)]
+    return {"status": "success", "periode": "2025-02-10 → 2025-02-16", "courses": courses, "count": count}
+
+
+@pytest.mark.parametrize("max_tokens", [1, 5, 10, 20, 30, 40, 50, 60, 80, 100, 150, 200, 400])
+def test_course_result_stays_within_budget(max_tokens):
+    result = compact_tool_result("get_courses_by_date_range", _result(), max_tokens)
+    assert count_tokens(result) <= max_tokens
+
+
+def test_small_result_is_not_truncated():
+    payload = json.loads(compact_tool_result("get_courses_by_date_range", _result(3), 1500))
+    assert payload["total"] == 3 and "tronque" not in payload
@@ -0,0 +1,193 @@
+"""
+Encodage compact des résultats d'outils renvoyés au modèle (messages "tool").
+
+Les listes de cours deviennent une table groupée par jour dont les noms de cours,
+professeurs et salles sont dédupliqués dans des dictionnaires :
+
+    {"status": "success", "periode": "...", "total": 3,
+     "colonnes": ["debut", "fin", "cours", "prof", "salle"],
+     "cours": ["Cm : Microéco 3", ...], "profs": ["G.Lagadec", ...], "salles": ["Ate : A7", ...],
+     "jours": {"2025-02-10": [["13:30", "15:30", 0, 0, 0], ...]}}
+
+Les titres sont nettoyés ("[Edt-Ens]", retours à la ligne). Au-delà de
+TOOL_RESULT_MAX_TOKENS, les dernières lignes sont retirées et remplacées par un
+résumé (nombre de séances restantes des cours les plus fréquents, les autres
+regroupés sous "autres"). Pour un très petit budget, la table puis le JSON lui-même
+sont coupés : le résultat ne dépasse jamais TOOL_RESULT_MAX_TOKENS.
+"""
+from collections import Counter
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from embedding_pipeline import count_tokens
+from schedule_store import clean_course_title, parse_event_datetime
+
+TOOL_RESULT_MAX_TOKENS = int(os.getenv("TOOL_RESULT_MAX_TOKENS", "1500"))
+# Cours détaillés au plus dans le résumé d'un résultat tronqué (les autres sont comptés ensemble)
+TOOL_RESULT_SUMMARY_COURSES = 10
+
+COURSE_COLUMNS = ["debut", "fin", "cours", "prof", "salle"]
+_COURSE_LIST_FUNCTIONS = {"get_courses_by_date_range", "get_courses_by_subject"}
+
+
+def _dumps(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def split_course_title(title: str, professeur: str = "") -> Tuple[str, str]:
+    """
+    (cours, salle) d'un titre brut : "Cm : Microéco 3 \\nG.Lagadec  \\nAte : A7 [Edt-Ens]"
+    donne ("Cm : Microéco 3", "Ate : A7"), la ligne du professeur étant déjà dans son champ.
+    """
+    parts = [" ".join(part.split()) for part in title.replace("[Edt-Ens]", "").split("\n")]
+    parts = [part for part in parts if part]
+    if not parts:
+        return "", ""
+    rest = [part for part in parts[1:] if part != professeur.strip()]
+    return parts[0], " - ".join(rest)
+
+
+def _split_datetime(value: str) -> Tuple[str, str]:
+    """('2025-02-10', '13:30') ; ('', valeur brute) si la date est illisible."""
+    try:
+        moment = parse_event_datetime(value)
+    except (TypeError, ValueError):
+        return "", value or ""
+    return moment.date().isoformat(), moment.strftime("%H:%M")
+
+
+class _Vocabulary:
+    """Valeurs distinctes d'une colonne, référencées par leur position."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._positions: Dict[str, int] = {}
+
+    def ref(self, value: str) -> int:
+        if value not in self._positions:
+            self._positions[value] = len(self.values)
+            self.values.append(value)
+        return self._positions[value]
+
+
+def _course_table(courses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    names, profs, rooms = _Vocabulary(), _Vocabulary(), _Vocabulary()
+    days: Dict[str, List[list]] = {}
+    for course in courses:
+        professeur = course.get("professeur") or ""
+        name, room = split_course_title(course.get("title") or "", professeur)
+        day, start = _split_datetime(course.get("start"))
+        _, end = _split_datetime(course.get("end"))
+        days.setdefault(day, []).append([start, end, names.ref(name), profs.ref(professeur),
+                                         rooms.ref(course.get("location") or room)])
+    return {"colonnes": COURSE_COLUMNS, "cours": names.values, "profs": profs.values,
+            "salles": rooms.values, "jours": days}
+
+
+def _summary(courses: List[Dict[str, Any]], max_courses: int) -> Dict[str, int]:
+    """Nombre de séances par cours, les plus fréquents d'abord ; au-delà de max_courses, regroupés dans "autres"."""
+    counts = Counter(split_course_title(course.get("title") or "", course.get("professeur") or "")[0]
+                     for course in courses).most_common()
+    if len(counts) <= max_courses:
+        return dict(counts)
+    summary = dict(counts[:max_courses])
+    summary["autres"] = sum(count for _, count in counts[max_courses:])
+    return summary
+
+
+def _compact_courses(result: Dict[str, Any], max_tokens: int) -> str:
+    courses = result.get("courses", [])
+    header = {key: value for key, value in result.items() if key not in ("courses", "count")}
+    header["total"] = len(courses)
+
+    encoded = _dumps({**header, **_course_table(courses)})
+    if count_tokens(encoded) <= max_tokens:
+        return encoded
+
+    # Trop long : plus grand préfixe de cours qui tient dans le budget avec le résumé du reste
+    # (limité aux cours les plus fréquents, pour laisser la place aux lignes détaillées)
+    def truncated(shown: int, max_courses: int = TOOL_RESULT_SUMMARY_COURSES) -> str:
+        return _dumps({**header, **_course_table(courses[:shown]),
+                       "tronque": {"affiches": shown,
+                                   "restants_par_cours": _summary(courses[shown:], max_courses)}})
+
+    low, high = 0, len(courses) - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(truncated(middle)) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    if low > 0:
+        return truncated(low)
+
+    # Même le résumé seul peut dépasser un petit budget : moins de cours détaillés
+    max_courses = TOOL_RESULT_SUMMARY_COURSES
+    while max_courses > 0 and count_tokens(truncated(0, max_courses)) > max_tokens:
+        max_courses //= 2
+    encoded = truncated(0, max_courses)
+    if count_tokens(encoded) <= max_tokens:
+        return encoded
+    # Puis sans la table vide (colonnes, dictionnaires), et en dernier recours coupé au budget
+    encoded = _dumps({**header, "tronque": {"affiches": 0, "restants_par_cours": _summary(courses, 0)}})
+    return _cut_to_tokens(encoded, max_tokens)
+
+
+def _cut_to_tokens(text: str, max_tokens: int) -> str:
+    """Plus long début de `text` tenant dans max_tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def _compact_next_course(result: Dict[str, Any]) -> str:
+    course = result.get("next_course")
+    if not course:
+        return _dumps({key: value for key, value in result.items() if key != "next_course"})
+    professeur = course.get("professeur") or ""
+    name, room = split_course_title(course.get("title") or "", professeur)
+    day, start = _split_datetime(course.get("start"))
+    _, end = _split_datetime(course.get("end"))
+    following = []
+    for other in course.get("following_courses", []):
+        other_day, other_start = _split_datetime(other.get("start"))
+        following.append([other_day, other_start, split_course_title(other.get("title") or "", other.get("professeur") or "")[0],
+                          other.get("professeur") or ""])
+    return _dumps({
+        "status": result.get("status"),
+        "prochain": {"cours": name, "prof": professeur, "salle": course.get("location") or room,
+                     "jour": day, "debut": start, "fin": end, "dans": course.get("time_until"),
+                     "aujourd_hui": course.get("is_today"), "demain": course.get("is_tomorrow")},
+        "suivants": {"colonnes": ["jour", "debut", "cours", "prof"], "lignes": following},
+        "total_a_venir": result.get("total_upcoming")
+    })
+
+
+def _compact_free_slots(slots: List[Dict[str, str]]) -> str:
+    return _dumps({"colonnes": ["debut", "fin", "description"],
+                   "creneaux": [[slot["start"], slot["end"], clean_course_title(slot.get("description", ""))]
+                                for slot in slots]})
+
+
+def compact_tool_result(function_name: str, result: Any, max_tokens: Optional[int] = None) -> str:
+    """Contenu du message "tool" pour le résultat d'un outil (JSON compact)."""
+    max_tokens = max_tokens or TOOL_RESULT_MAX_TOKENS
+    try:
+        if function_name in _COURSE_LIST_FUNCTIONS and isinstance(result, dict) and "courses" in result:
+            return _compact_courses(result, max_tokens)
+        if function_name == "get_next_course" and isinstance(result, dict) and "next_course" in result:
+            return _compact_next_course(result)
+        if function_name == "get_free_time_slots" and isinstance(result, list):
+            return _compact_free_slots(result)
+    except (AttributeError, KeyError, TypeError):
+        # Résultat d'une forme inattendue : on le transmet tel quel
+        pass
+    return _dumps(result)
@@ -2,32 +2,28 @@ import logging
 import os
 import shutil
 from faiss_handler import json_to_documents, retrieve_documents, save_to_faiss
-from scrap_edt import get_edt_semaine_json
-
-##################SETUP DES LOGS###################
-# Ensure the logs directory exists
-log_dir = "logs"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)  # Create the directory if it doesn't exist
-
-
-script_name = os.path.splitext(os.path.basename(__file__))[0]
-log_file = os.path.join(log_dir, f"{script_name}.warn.log")
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),  # Écrire dans le fichier log
-        logging.StreamHandler()  # Écrire dans la console (terminal)
-    ]
-)
-##############################################
+from scrap_edt import fetch_edt_bulk, get_edt_semaine
 
 def load_and_save_to_faiss_json(user_id):
-    get_edt_semaine_json(user_id)
+    get_edt_semaine(user_id)
     docs=json_to_documents(user_id)
-    save_to_faiss(docs)
+    # Upsert : seuls les cours nouveaux ou modifiés sont embeddés, ceux qui ont disparu sont supprimés
+    save_to_faiss(docs, remove_missing=True)
+
+def load_and_save_to_faiss_bulk(user_ids):
+    """
+    Ingestion de plusieurs utilisateurs : téléchargements en parallèle, puis embeddings
+    par lots concurrents (débit partagé) et mise à jour des index utilisateur en parallèle.
+    """
+    results = fetch_edt_bulk(user_ids)
+    docs = []
+    for user_id, result in results.items():
+        if result["status"] != "error":
+            docs.extend(json_to_documents(user_id))
+        else:
+            logging.error(f"Emploi du temps de {user_id} non récupéré : {result.get('error')}")
+    save_to_faiss(docs, remove_missing=True)
+    return results
 
 def remove_data(file_path):
     if os.path.exists(file_path) and os.path.isdir(file_path):